@@ -84,7 +84,8 @@ def setup_log_dir() -> Path:
 # ---------------------------------------------------------------------------
 def open_log(log_dir: Path, name: str):
     """打开日志文件用于写入，并记录文件句柄以便 shutdown 时关闭。"""
-    f = open(log_dir / name, "w", encoding="utf-8")
+    # 追加模式：后端按 copytruncate 切分 backend.log 时写入位置随之回到文件开头
+    f = open(log_dir / name, "a", encoding="utf-8")
     _log_files.append(f)
     return f
 
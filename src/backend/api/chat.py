@@ -1,8 +1,11 @@
 """聊天 SSE 流式端点"""
-import json
+import asyncio
+import uuid
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from src.backend.core.logger import get_logger
+from src.backend.core.metrics import CHAT_REQUESTS
+from src.backend.api.sse import SSEWriter, encode_event
 
 log = get_logger("api.chat")
 
@@ -10,40 +13,78 @@ chat_router = APIRouter(prefix="/api/chat")
 MAX_INPUT_LENGTH = 4096
 
 
-@chat_router.post("/stream")
-async def stream_chat(request: Request):
-    data = await request.json()
+def validate_chat_input(data) -> tuple[str | None, str | None]:
+    """校验聊天请求体，返回 (去除首尾空白的文本, 错误信息)，HTTP 与 Socket.IO 共用"""
     if not isinstance(data, dict):
-        return JSONResponse({"error": "请求体必须是 JSON 对象"}, status_code=400)
+        CHAT_REQUESTS.labels("rejected").inc()
+        return None, "请求体必须是 JSON 对象"
     text = data.get("text", "")
     if not isinstance(text, str):
         log.warning(f"拒绝非字符串消息, type={type(text).__name__}")
-        return JSONResponse({"error": "消息内容必须是字符串"}, status_code=400)
+        CHAT_REQUESTS.labels("rejected").inc()
+        return None, "消息内容必须是字符串"
     if not text or not text.strip():
         log.warning("拒绝空消息请求")
-        return JSONResponse({"error": "消息内容不能为空"}, status_code=400)
+        CHAT_REQUESTS.labels("rejected").inc()
+        return None, "消息内容不能为空"
     if len(text) > MAX_INPUT_LENGTH:
         log.warning(f"拒绝超长消息, 长度={len(text)}")
-        return JSONResponse({"error": f"消息长度不能超过 {MAX_INPUT_LENGTH} 字符"}, status_code=400)
+        CHAT_REQUESTS.labels("rejected").inc()
+        return None, f"消息长度不能超过 {MAX_INPUT_LENGTH} 字符"
+    return text.strip(), None
+
+
+@chat_router.post("/stream")
+async def stream_chat(request: Request):
+    data = await request.json()
+    text, err = validate_chat_input(data)
+    if err:
+        return JSONResponse({"error": err}, status_code=400)
     from src.backend.services import get_brain
     brain = get_brain()
     if brain is None:
         log.warning("引擎未就绪，拒绝请求")
+        CHAT_REQUESTS.labels("unavailable").inc()
         return JSONResponse({"error": "AI 引擎正在加载中，请稍后再试"}, status_code=503)
     log.info(f"收到聊天请求, 长度={len(text)}")
+    CHAT_REQUESTS.labels("accepted").inc()
+
+    request_id = uuid.uuid4().hex
 
     async def generate():
         try:
-            for item in brain.chat_stream(text.strip()):
-                yield f"data: {json.dumps(item, ensure_ascii=False)}\n\n"
-        except GeneratorExit:
+            async for event in SSEWriter(brain.chat_stream(text, request_id)).stream():
+                yield event
+        except asyncio.CancelledError:
             log.info("SSE 客户端断开连接")
+            # 泵线程可能仍阻塞在队列上，直接通知 BrainService 中止推理
+            brain.cancel(request_id)
+            raise
         except Exception as e:
             log.exception("SSE 流异常")
-            yield f"data: {json.dumps({'type': 'error', 'text': str(e)}, ensure_ascii=False)}\n\n"
+            CHAT_REQUESTS.labels("error").inc()
+            yield encode_event({"type": "error", "text": str(e)})
 
     return StreamingResponse(
         generate(),
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+@chat_router.post("/cancel")
+async def cancel_chat(request: Request):
+    """取消生成：body 为 {"request_id": "..."}，省略时取消全部进行中的生成"""
+    data = {}
+    if request.headers.get("content-type", "").startswith("application/json"):
+        data = await request.json()
+    request_id = data.get("request_id") if isinstance(data, dict) else None
+    if request_id is not None and not isinstance(request_id, str):
+        return JSONResponse({"error": "request_id 必须是字符串"}, status_code=400)
+    from src.backend.services import get_brain
+    brain = get_brain()
+    if brain is None:
+        return JSONResponse({"error": "AI 引擎正在加载中，请稍后再试"}, status_code=503)
+    cancelled = brain.cancel(request_id)
+    log.info(f"取消生成: {cancelled}")
+    return JSONResponse({"status": "ok", "cancelled": cancelled})
@@ -1,4 +1,5 @@
 """配置 API"""
+import asyncio
 import copy
 import os
 import shutil
@@ -6,6 +7,7 @@ import glob as globmod
 import yaml
 from fastapi import APIRouter, Request, UploadFile, File
 from fastapi.responses import JSONResponse
+from src.backend.core import config_diff
 from src.backend.core.logger import get_logger
 
 log = get_logger("api.config")
@@ -44,6 +46,17 @@ CONFIG_WHITELIST = frozenset({
     "brain.do_sample",
     "brain.stop_sequences",
     "brain.num_beams",
+    "brain.quantization",
+    "brain.reload_stop_first",
+    "brain.reload_drain_timeout",
+    "brain.llamacpp_threads",
+    "brain.llamacpp_gpu_layers",
+    "brain.llamacpp_use_mmap",
+    "brain.llamacpp_cache_mb",
+    "brain.speculative_mode",
+    "brain.speculative_draft_model",
+    "brain.speculative_num_tokens",
+    "brain.speculative_ngram_max",
     "perception.tts.api_url",
     "perception.tts.sovits_weights",
     "perception.tts.gpt_weights",
@@ -87,6 +100,8 @@ CONFIG_WHITELIST = frozenset({
     "behavior.cron_expression",
     "behavior.message_templates_enabled",
     "behavior.llm_generation_enabled",
+    "behavior.precompute_pool_size",
+    "behavior.precompute_max_age_minutes",
     "behavior.max_daily_messages",
     "behavior.quiet_hours_start",
     "behavior.quiet_hours_end",
@@ -94,6 +109,7 @@ CONFIG_WHITELIST = frozenset({
     "session.max_history_messages",
     "session.auto_save_interval",
     "session.auto_title_generation",
+    "session.title_batch_size",
     "session.max_message_length",
     "session.export_format",
     "session.dir",
@@ -112,6 +128,8 @@ CONFIG_WHITELIST = frozenset({
     "diary.enabled",
     "diary.auto_generate",
     "diary.generation_time",
+    "diary.idle_delay_minutes",
+    "diary.aggregate_max_chars",
     "diary.output_dir",
     # 新增日记类型配置
     "diary.daily.enabled",
@@ -126,6 +144,15 @@ CONFIG_WHITELIST = frozenset({
     "diary.yearly.enabled",
     "diary.yearly.frequency",
     "diary.yearly.prompt",
+    "background.max_concurrency",
+    "background.idle_grace_seconds",
+    "logging.ws_batch_interval_ms",
+    "logging.ws_max_per_second",
+    "logging.rotate_max_mb",
+    "logging.rotate_interval_hours",
+    "logging.backup_count",
+    "logging.retention_days",
+    "logging.stdio_suppress_patterns",
 })
 
 
@@ -140,8 +167,8 @@ def _flatten_keys(d: dict, prefix: str = "") -> set[str]:
             keys.add(full_key)
     return keys
 
+
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
-CONFIG_PATH = os.path.join(ROOT_DIR, "config", "config.yaml")
 EMOTION_REFS_DIR = os.path.join(ROOT_DIR, "assets", "emotion_refs")
 
 
@@ -204,19 +231,31 @@ async def update_config(request: Request):
     if not new_config:
         return JSONResponse(content={"status": "ok", "message": "无可更新的配置项"})
 
+    from src.backend.core.config import config_path, validate, write_config
+    from src.backend.core.config import get_config as current_config
+    # 只校验本次请求修改的键，文件中其余键的问题不应阻止这次修改
+    errors = validate(new_config)
+    if errors:
+        return JSONResponse(content={"error": "配置校验失败", "detail": errors}, status_code=400)
+
+    # 与运行中的快照比对（与文件监视器一致），而不是与磁盘上的原始文件比对
+    old = current_config()
+    if not config_diff.changed_keys(old, _deep_merge(old, new_config)):
+        return JSONResponse(content={"status": "ok", "reload": "skipped", "actions": {}})
     existing = {}
-    if os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+    if os.path.exists(config_path()):
+        with open(config_path(), "r", encoding="utf-8") as f:
             existing = yaml.safe_load(f) or {}
-    merged = _deep_merge(existing, new_config)
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        yaml.dump(merged, f, allow_unicode=True, default_flow_style=False)
-    from src.backend.core.config import reload_config
-    reload_config()
-    from src.backend.services import reload_services
-    reload_services()
-    log.info("配置已更新")
-    return JSONResponse(content={"status": "ok"})
+    # 临时文件 + os.replace 原子写入，同时发布新快照；文件监视器随后比对无差异会跳过
+    new = write_config(_deep_merge(existing, new_config), strict=False)
+    changed = config_diff.changed_keys(old, new)
+    # 只重建受影响的子系统；引擎在后台蓝绿重载，进度通过 engine_reload 事件推送
+    from src.backend.services import apply_config_changes
+    # 记忆库、日记索引等的重建会做磁盘 I/O，放到线程中避免阻塞事件循环
+    actions = await asyncio.to_thread(apply_config_changes, changed)
+    reload = "started" if config_diff.ENGINE in actions else "skipped"
+    log.info(f"配置已更新: {sorted(changed)}，处理={sorted(actions)}")
+    return JSONResponse(content={"status": "ok", "reload": reload, "actions": actions})
 
 
 @config_router.get("/emotion-refs")
@@ -0,0 +1,100 @@
+"""日记列表 / 检索 / 阅读 API
+
+SQLite 查询与文件读取都放到线程中执行，避免阻塞事件循环。
+"""
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+from src.backend.core.logger import get_logger
+
+log = get_logger("api.diary")
+
+diary_router = APIRouter(prefix="/api/diary")
+
+_DIARY_TYPES = ("daily", "weekly", "monthly", "yearly")
+_store = None
+_store_lock = threading.Lock()
+
+
+def _diary_store():
+    """优先复用 BrainService 中 DiaryWriter 的索引，引擎未加载时单独打开（首次打开会重建索引）"""
+    global _store
+    from src.backend.services import get_brain
+    brain = get_brain()
+    if brain is not None and brain.diary is not None:
+        return brain.diary.store
+    with _store_lock:
+        if _store is not None:
+            return _store
+        from src.backend.core.config import get, resolve_path
+        from src.backend.brain.diary_store import DiaryStore
+        diary_dir = resolve_path(get("diary.output_dir", "data/diary"))
+        diary_dir.mkdir(parents=True, exist_ok=True)
+        _store = DiaryStore(diary_dir)
+    return _store
+
+
+def _parse_date(value: str | None, end_of_day: bool = False) -> datetime | None:
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value)
+    # 仅给出日期的 until 包含当天全天
+    if end_of_day and len(value) == 10:
+        dt += timedelta(days=1, microseconds=-1)
+    return dt
+
+
+def _check_type(diary_type: str | None):
+    if diary_type and diary_type not in _DIARY_TYPES:
+        return JSONResponse({"error": f"type 必须是 {', '.join(_DIARY_TYPES)} 之一"}, status_code=400)
+    return None
+
+
+@diary_router.get("")
+async def list_diaries(
+    type: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+):
+    err = _check_type(type)
+    if err:
+        return err
+    try:
+        since_dt, until_dt = _parse_date(since), _parse_date(until, end_of_day=True)
+    except ValueError:
+        return JSONResponse({"error": "since/until 必须是 ISO 日期，如 2026-01-31"}, status_code=400)
+    total, items = await asyncio.to_thread(
+        lambda: _diary_store().list_page(type, since_dt, until_dt, (page - 1) * page_size, page_size))
+    return JSONResponse({"total": total, "page": page, "page_size": page_size, "items": items})
+
+
+@diary_router.get("/search")
+async def search_diaries(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: str | None = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+):
+    err = _check_type(type)
+    if err:
+        return err
+    total, items = await asyncio.to_thread(
+        lambda: _diary_store().search(q.strip(), type, (page - 1) * page_size, page_size))
+    return JSONResponse({"total": total, "page": page, "page_size": page_size, "items": items})
+
+
+@diary_router.get("/{entry_id}")
+async def get_diary(entry_id: int):
+    def _load():
+        store = _diary_store()
+        entry = store.get(entry_id)
+        return None if entry is None else {**entry, "content": store.read(entry)}
+
+    result = await asyncio.to_thread(_load)
+    if result is None:
+        return JSONResponse({"error": "日记不存在"}, status_code=404)
+    return JSONResponse(result)
@@ -0,0 +1,39 @@
+"""历史日志查询 API — 基于 structured.jsonl 及其时间索引分页读取"""
+import asyncio
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+from src.backend.core.log_index import CursorExpired, query_page
+from src.backend.core.log_query import STRUCTURED_LOG, EntryFilter
+from src.backend.core.logger import get_logger, latest_log_dir
+
+log = get_logger("api.logs")
+
+logs_router = APIRouter(prefix="/api/logs")
+
+
+@logs_router.get("")
+async def query_logs(
+    level: str | None = None,
+    module: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    q: str | None = Query(None, max_length=200),
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=500),
+):
+    try:
+        entry_filter = EntryFilter(level, module, since, until, q)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    log_dir = latest_log_dir()
+    path = log_dir / STRUCTURED_LOG if log_dir else None
+    if path is None or not path.is_file():
+        return JSONResponse({"items": [], "next_cursor": None})
+    try:
+        # 首次建立索引需要顺序读一遍文件，放到线程中避免阻塞事件循环
+        items, next_cursor = await asyncio.to_thread(query_page, path, entry_filter, cursor, limit)
+    except CursorExpired as e:
+        return JSONResponse({"error": str(e)}, status_code=410)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"items": items, "next_cursor": next_cursor})
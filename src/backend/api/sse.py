@@ -0,0 +1,163 @@
+"""SSE 输出 — token 合并、快速 JSON 编码与注释心跳"""
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from src.backend.core.config import get
+from src.backend.core.logger import get_logger
+
+log = get_logger("api.sse")
+
+HEARTBEAT = ": ping\n\n"
+_END = object()
+
+
+def encode_event(item: dict) -> str:
+    """编码单个 SSE data 事件，优先使用 orjson（默认即输出 UTF-8，不转义中文）"""
+    if orjson is not None:
+        return f"data: {orjson.dumps(item).decode('utf-8')}\n\n"
+    return f"data: {json.dumps(item, ensure_ascii=False)}\n\n"
+
+
+class _Failure:
+    __slots__ = ("exc",)
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class ThreadedStream:
+    """在后台线程中消费同步 generator，结果投递到当前事件循环的队列
+
+    BrainService.chat_stream 会阻塞在 queue.get 上，不能直接在事件循环里迭代。
+    """
+
+    def __init__(self, source: Iterator):
+        self._source = source
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._pump, name="sse-pump", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _put(self, item):
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:
+            # 事件循环已关闭
+            self._stop.set()
+
+    def _pump(self):
+        try:
+            for item in self._source:
+                if self._stop.is_set():
+                    break
+                self._put(item)
+        except Exception as e:
+            self._put(_Failure(e))
+        finally:
+            # 在同一线程关闭 generator，触发其 GeneratorExit 清理逻辑
+            close = getattr(self._source, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    log.debug("关闭源 generator 失败", exc_info=True)
+            self._put(_END)
+
+    async def get(self, timeout: float | None = None):
+        """取下一项；超时抛 asyncio.TimeoutError，结束返回 _END"""
+        if timeout is None:
+            item = await self._queue.get()
+        else:
+            item = await asyncio.wait_for(self._queue.get(), timeout)
+        if isinstance(item, _Failure):
+            raise item.exc
+        return item
+
+    def close(self):
+        self._stop.set()
+
+
+async def coalesce(source: Iterator[dict], flush_interval: float,
+                   heartbeat_interval: float = 0.0) -> AsyncIterator[dict | None]:
+    """异步迭代 chat_stream 的 dict 流
+
+    - flush_interval 内到达的连续 chunk 合并为一个 chunk
+    - heartbeat_interval 内无输出时 yield None，由调用方决定如何保活
+    """
+    loop = asyncio.get_running_loop()
+    src = ThreadedStream(source)
+    src.start()
+    pending: list[str] = []
+    deadline = 0.0
+    last_sent = loop.time()
+    try:
+        while True:
+            now = loop.time()
+            if pending:
+                timeout = max(0.0, deadline - now)
+            elif heartbeat_interval > 0:
+                timeout = max(0.0, last_sent + heartbeat_interval - now)
+            else:
+                timeout = None
+            try:
+                item = await src.get(timeout)
+            except asyncio.TimeoutError:
+                if pending:
+                    yield _merge(pending)
+                else:
+                    yield None
+                last_sent = loop.time()
+                continue
+            if item is _END:
+                break
+            if flush_interval > 0 and item.get("type") == "chunk":
+                if not pending:
+                    deadline = loop.time() + flush_interval
+                pending.append(item["text"])
+                continue
+            if pending:
+                yield _merge(pending)
+            yield item
+            last_sent = loop.time()
+        if pending:
+            yield _merge(pending)
+    finally:
+        src.close()
+
+
+def _merge(pending: list[str]) -> dict:
+    item = {"type": "chunk", "text": "".join(pending)}
+    pending.clear()
+    return item
+
+
+def flush_interval_from_config() -> float:
+    return max(0.0, get("server.sse_flush_interval_ms", 20) / 1000)
+
+
+class SSEWriter:
+    """将 chat_stream 的 dict 流编码为 SSE 文本，空闲时发送注释心跳防止代理断开连接"""
+
+    def __init__(self, source: Iterator[dict], flush_interval: float | None = None,
+                 heartbeat_interval: float | None = None):
+        self._source = source
+        if flush_interval is None:
+            flush_interval = flush_interval_from_config()
+        if heartbeat_interval is None:
+            heartbeat_interval = get("server.sse_heartbeat_interval", 15)
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.heartbeat_interval = float(heartbeat_interval) if heartbeat_interval else 0.0
+
+    async def stream(self) -> AsyncIterator[str]:
+        async for item in coalesce(self._source, self.flush_interval, self.heartbeat_interval):
+            yield HEARTBEAT if item is None else encode_event(item)
@@ -1,16 +1,13 @@
 """系统状态 API + Swagger 文档"""
 import os
 import base64
-import psutil
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse, HTMLResponse, Response
 from src.backend.core.logger import get_logger
+from src.backend.core import metrics
 
 log = get_logger("api.system")
 
-# 预热 psutil cpu_percent，interval=None 首次调用返回 0.0
-psutil.cpu_percent(interval=None)
-
 system_router = APIRouter()
 
 API_SPEC = {
@@ -42,39 +39,103 @@ API_SPEC = {
         "/api/system/status": {
             "get": {"summary": "系统状态", "responses": {"200": {"description": "CPU/RAM/GPU info"}}},
         },
+        "/api/system/history": {
+            "get": {
+                "summary": "系统资源时间序列",
+                "parameters": [{"name": "seconds", "in": "query", "schema": {"type": "number"}}],
+                "responses": {"200": {"description": "CPU/RAM/GPU samples"}},
+            },
+        },
+        "/api/diary": {
+            "get": {
+                "summary": "日记列表（分页，最新在前）",
+                "parameters": [
+                    {"name": "type", "in": "query", "schema": {"type": "string", "enum": ["daily", "weekly", "monthly", "yearly"]}},
+                    {"name": "since", "in": "query", "schema": {"type": "string", "format": "date"}},
+                    {"name": "until", "in": "query", "schema": {"type": "string", "format": "date"}},
+                    {"name": "page", "in": "query", "schema": {"type": "integer"}},
+                    {"name": "page_size", "in": "query", "schema": {"type": "integer"}},
+                ],
+                "responses": {"200": {"description": "total + items"}},
+            },
+        },
+        "/api/diary/search": {
+            "get": {
+                "summary": "日记全文检索",
+                "parameters": [
+                    {"name": "q", "in": "query", "required": True, "schema": {"type": "string"}},
+                    {"name": "type", "in": "query", "schema": {"type": "string"}},
+                    {"name": "page", "in": "query", "schema": {"type": "integer"}},
+                    {"name": "page_size", "in": "query", "schema": {"type": "integer"}},
+                ],
+                "responses": {"200": {"description": "total + items with snippet"}},
+            },
+        },
+        "/api/diary/{entry_id}": {
+            "get": {"summary": "读取日记全文", "responses": {"200": {"description": "entry + content"}, "404": {"description": "not found"}}},
+        },
+        "/api/logs": {
+            "get": {
+                "summary": "历史日志查询（structured.jsonl，按时间正序，游标分页）",
+                "parameters": [
+                    {"name": "level", "in": "query", "schema": {"type": "string"}, "description": "最低级别"},
+                    {"name": "module", "in": "query", "schema": {"type": "string"}, "description": "模块名，包含子模块"},
+                    {"name": "since", "in": "query", "schema": {"type": "string"}, "description": "epoch / ISO 时间 / 相对时长如 2h"},
+                    {"name": "until", "in": "query", "schema": {"type": "string"}},
+                    {"name": "q", "in": "query", "schema": {"type": "string"}, "description": "消息关键字"},
+                    {"name": "cursor", "in": "query", "schema": {"type": "string"}, "description": "上一页返回的 next_cursor"},
+                    {"name": "limit", "in": "query", "schema": {"type": "integer"}},
+                ],
+                "responses": {
+                    "200": {"description": "items + next_cursor"},
+                    "400": {"description": "参数无效"},
+                    "410": {"description": "日志已切分，游标失效"},
+                },
+            },
+        },
+        "/metrics": {
+            "get": {"summary": "Prometheus 指标", "responses": {"200": {"description": "OpenMetrics text"}, "503": {"description": "prometheus_client 未安装"}}},
+        },
     },
 }
 
 
-def _gpu_info():
-    try:
-        import GPUtil
-        gpus = GPUtil.getGPUs()
-        if gpus:
-            g = gpus[0]
-            return {"name": g.name, "mem_used": round(g.memoryUsed / 1024, 1), "mem_total": round(g.memoryTotal / 1024, 1), "load": round(g.load * 100)}
-    except Exception:
-        pass
-    return None
-
-
 @system_router.get("/api/system/status")
 async def system_status():
     from src.backend.services import get_status, get_brain
-    mem = psutil.virtual_memory()
+    from src.backend.services.system_sampler import get_sampler
+    sample = get_sampler().latest() or {}
     svc = get_status()
     brain = get_brain()
+    engine = brain.engine if brain else None
+    footprint = engine.memory_footprint() if engine else None
     return JSONResponse(content={
-        "cpu_percent": psutil.cpu_percent(interval=None),
-        "ram_used": round(mem.used / (1024 ** 3), 1),
-        "ram_total": round(mem.total / (1024 ** 3), 1),
-        "gpu": _gpu_info(),
+        "cpu_percent": sample.get("cpu_percent", 0.0),
+        "ram_used": sample.get("ram_used", 0),
+        "ram_total": sample.get("ram_total", 0),
+        "gpu": sample.get("gpu"),
+        "sampled_at": sample.get("time"),
         "services_ready": svc["ready"],
         "loading_status": svc["services"],
         "inference_speed": brain._last_inference_speed if brain else 0,
+        "engine_memory_gb": round(footprint / (1024 ** 3), 2) if footprint else None,
     })
 
 
+@system_router.get("/api/system/history")
+async def system_history(seconds: float | None = Query(None, gt=0)):
+    from src.backend.services.system_sampler import get_sampler
+    sampler = get_sampler()
+    return JSONResponse(content={"interval": sampler.interval, "samples": sampler.history(seconds)})
+
+
+@system_router.get("/metrics")
+async def prometheus_metrics():
+    if not metrics.is_available():
+        return JSONResponse(content={"error": "prometheus_client 未安装，指标不可用"}, status_code=503)
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 @system_router.get("/api/docs/spec")
 async def api_spec():
     return JSONResponse(content=API_SPEC)
@@ -3,6 +3,7 @@ import os
 import asyncio
 import logging
 import time
+import uuid
 from collections import defaultdict
 
 _env_root = os.environ.get("YUEXIA_ROOT", "").strip()
@@ -13,10 +14,21 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse
 
+from src.backend.core.metrics import CHAT_REQUESTS, SOCKETIO_CLIENTS, SOCKETIO_EVENTS
+
 log = logging.getLogger(__name__)
 
+
+class _InstrumentedAsyncServer(socketio.AsyncServer):
+    """统计所有发送事件的 AsyncServer"""
+
+    async def emit(self, event, *args, **kwargs):
+        SOCKETIO_EVENTS.labels(event).inc()
+        return await super().emit(event, *args, **kwargs)
+
+
 # Socket.IO ASGI 模式
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+sio = _InstrumentedAsyncServer(async_mode="asgi", cors_allowed_origins="*")
 
 
 def create_app():
@@ -70,11 +82,15 @@ def create_app():
     from src.backend.api.session import session_router
     from src.backend.api.system import system_router
     from src.backend.api.asr_api import asr_router
+    from src.backend.api.diary_api import diary_router
+    from src.backend.api.logs_api import logs_router
     app.include_router(chat_router)
     app.include_router(config_router)
     app.include_router(session_router)
     app.include_router(system_router)
     app.include_router(asr_router)
+    app.include_router(diary_router)
+    app.include_router(logs_router)
 
     # Security: request size limit & rate limit
     if cfg_get("security.api_access_control", False):
@@ -100,6 +116,12 @@ def create_app():
                 del _rate_counts[ip]
             return await call_next(request)
 
+    @app.on_event("startup")
+    async def capture_server_loop():
+        # 日志写线程通过该循环推送 /ws/logs
+        from src.backend.services.log_service import set_server_loop
+        set_server_loop(asyncio.get_running_loop())
+
     # 全局异常处理
     @app.exception_handler(Exception)
     async def handle_exception(request: Request, exc: Exception):
@@ -110,22 +132,124 @@ def create_app():
 
 
 # Socket.IO 事件处理
+# Socket.IO 聊天：每个连接同时只允许一条生成中的消息
+_ws_chat_tasks: dict[str, asyncio.Task] = {}
+
+
 @sio.on("connect", namespace="/ws/events")
 async def events_connect(sid, environ):
+    SOCKETIO_CLIENTS.labels("/ws/events").inc()
     await sio.emit("connected", {"status": "ok"}, room=sid, namespace="/ws/events")
 
 
+@sio.on("disconnect", namespace="/ws/events")
+async def events_disconnect(sid):
+    SOCKETIO_CLIENTS.labels("/ws/events").dec()
+    task = _ws_chat_tasks.pop(sid, None)
+    if task:
+        task.cancel()
+
+
+async def _ws_chat_run(sid, chat_id, brain, text):
+    from src.backend.api.sse import coalesce, flush_interval_from_config
+    ns = "/ws/events"
+    # chat_id 由客户端提供，仅在本连接内唯一；推理侧使用独立的 request_id
+    request_id = uuid.uuid4().hex
+    try:
+        async for item in coalesce(brain.chat_stream(text, request_id), flush_interval_from_config()):
+            item = {**item, "id": chat_id}
+            kind = item.get("type")
+            if kind == "start":
+                continue
+            if kind == "end":
+                await sio.emit("chat_end", item, room=sid, namespace=ns)
+            elif kind == "cancelled":
+                await sio.emit("chat_cancelled", item, room=sid, namespace=ns)
+            elif kind == "error":
+                await sio.emit("chat_error", item, room=sid, namespace=ns)
+            else:
+                await sio.emit("chat_chunk", item, room=sid, namespace=ns)
+    except asyncio.CancelledError:
+        log.info(f"Socket.IO 聊天已取消: sid={sid}")
+        brain.cancel(request_id)
+        try:
+            await sio.emit("chat_cancelled", {"id": chat_id}, room=sid, namespace=ns)
+        except Exception:
+            pass
+        raise
+    except Exception as e:
+        log.exception("Socket.IO 聊天异常")
+        CHAT_REQUESTS.labels("error").inc()
+        await sio.emit("chat_error", {"id": chat_id, "type": "error", "text": str(e)}, room=sid, namespace=ns)
+    finally:
+        if _ws_chat_tasks.get(sid) is asyncio.current_task():
+            del _ws_chat_tasks[sid]
+
+
+@sio.on("chat", namespace="/ws/events")
+async def events_chat(sid, data):
+    """流式聊天：chat_chunk / chat_end / chat_error 回推到同一连接，返回值作为 ack"""
+    from src.backend.api.chat import validate_chat_input
+    text, err = validate_chat_input(data)
+    if err:
+        return {"error": err}
+    running = _ws_chat_tasks.get(sid)
+    if running and not running.done():
+        return {"error": "上一条消息仍在生成中"}
+    from src.backend.services import get_brain
+    brain = get_brain()
+    if brain is None:
+        CHAT_REQUESTS.labels("unavailable").inc()
+        return {"error": "AI 引擎正在加载中，请稍后再试"}
+    chat_id = str(data.get("id") or uuid.uuid4().hex)
+    log.info(f"收到 Socket.IO 聊天请求, 长度={len(text)}")
+    CHAT_REQUESTS.labels("accepted").inc()
+    _ws_chat_tasks[sid] = asyncio.create_task(_ws_chat_run(sid, chat_id, brain, text))
+    return {"status": "accepted", "id": chat_id}
+
+
+@sio.on("chat_cancel", namespace="/ws/events")
+async def events_chat_cancel(sid, data=None):
+    task = _ws_chat_tasks.get(sid)
+    if not task or task.done():
+        return {"status": "idle"}
+    task.cancel()
+    return {"status": "cancelled"}
+
+
 @sio.on("connect", namespace="/ws/logs")
 async def logs_connect(sid, environ):
+    SOCKETIO_CLIENTS.labels("/ws/logs").inc()
+    from urllib.parse import parse_qs
+    from src.backend.services.log_service import register_log_client, replay_entries
+    level = parse_qs(environ.get("QUERY_STRING", "")).get("level", [None])[0]
+    register_log_client(sid, level)
     await sio.emit("connected", {"status": "ok"}, room=sid, namespace="/ws/logs")
     try:
-        from src.backend.services.log_service import _log_buffer
-        for entry in list(_log_buffer):
-            await sio.emit("log", entry, room=sid, namespace="/ws/logs")
+        # 缓冲日志作为一批回放
+        entries = replay_entries(sid)
+        if entries:
+            await sio.emit("log_batch", entries, room=sid, namespace="/ws/logs")
     except Exception:
         log.exception("回放日志缓冲失败")
 
 
+@sio.on("log_level", namespace="/ws/logs")
+async def logs_set_level(sid, data=None):
+    """客户端调整接收的最低日志级别"""
+    from src.backend.services.log_service import register_log_client
+    level = (data or {}).get("level") if isinstance(data, dict) else data
+    register_log_client(sid, level)
+    return {"status": "ok"}
+
+
+@sio.on("disconnect", namespace="/ws/logs")
+async def logs_disconnect(sid):
+    SOCKETIO_CLIENTS.labels("/ws/logs").dec()
+    from src.backend.services.log_service import unregister_log_client
+    unregister_log_client(sid)
+
+
 app = create_app()
 # 将 FastAPI 挂载到 Socket.IO ASGI 应用
 asgi_app = socketio.ASGIApp(sio, app)
@@ -3,12 +3,13 @@ import json
 import asyncio
 import base64
 import mimetypes
+import uuid
 from typing import AsyncIterator
 
 import httpx
 
 from src.backend.brain.base_engine import BaseEngine
-from src.backend.core.config import get
+from src.backend.core.config import get, sampling
 from src.backend.core.logger import get_logger
 
 log = get_logger("engine.api")
@@ -40,6 +41,9 @@ class APIEngine(BaseEngine):
         )
         self.client = httpx.AsyncClient(timeout=timeout, proxy=proxy, limits=limits)
         self._retry_count = get("network.retry_count", 3)
+        # request_id -> 进行中的流式响应，abort 时直接关闭连接
+        self._streams: dict[str, httpx.Response] = {}
+        self._aborted: set[str] = set()
         log.info(f"API 引擎已初始化: url={self.api_url}, model={self.api_model}")
 
     @property
@@ -97,28 +101,42 @@ class APIEngine(BaseEngine):
         msg["content"] = content_parts
         return result
 
-    async def generate(self, messages: list[dict], images: list[str] | None = None) -> AsyncIterator[str]:
+    async def generate(self, messages: list[dict], images: list[str] | None = None,
+                       request_id: str | None = None) -> AsyncIterator[str]:
+        request_id = request_id or uuid.uuid4().hex
+        try:
+            async for delta in self._generate(messages, images, request_id):
+                yield delta
+        finally:
+            self._streams.pop(request_id, None)
+            self._aborted.discard(request_id)
+
+    async def _generate(self, messages: list[dict], images: list[str] | None, request_id: str) -> AsyncIterator[str]:
         if images:
             messages = self._build_messages_with_images(messages, images)
 
+        sp = sampling()
         payload = {
             "model": self.api_model,
             "messages": messages,
             "stream": True,
-            "temperature": get("brain.temperature", 0.7),
-            "max_tokens": get("brain.max_tokens", 4096),
-            "top_p": get("brain.top_p", 0.9),
-            "frequency_penalty": get("brain.frequency_penalty", 0.0),
-            "presence_penalty": get("brain.presence_penalty", 0.0),
-            "stop": get("brain.stop_sequences", None) or None,
+            "temperature": sp.temperature,
+            "max_tokens": sp.max_tokens,
+            "top_p": sp.top_p,
+            "frequency_penalty": sp.frequency_penalty,
+            "presence_penalty": sp.presence_penalty,
+            "stop": list(sp.stop_sequences) or None,
         }
         url = f"{self.api_url}/v1/chat/completions"
         headers = self._build_headers()
 
         last_err = None
         for attempt in range(self._retry_count + 1):
+            if request_id in self._aborted:
+                return
             try:
                 async with self.client.stream("POST", url, json=payload, headers=headers) as resp:
+                    self._streams[request_id] = resp
                     if resp.status_code >= 500 and attempt < self._retry_count:
                         body = await resp.aread()
                         log.warning(f"API 5xx (尝试 {attempt+1}/{self._retry_count+1}): HTTP {resp.status_code}")
@@ -146,20 +164,33 @@ class APIEngine(BaseEngine):
                             log.debug(f"SSE 解析跳过: {e}")
                             continue
                 return
-            except (httpx.ConnectError, httpx.TimeoutException) as e:
+            except Exception as e:
+                if request_id in self._aborted:
+                    log.info(f"API 请求已中止: {request_id}")
+                    return
+                if not isinstance(e, (httpx.ConnectError, httpx.TimeoutException)):
+                    log.error(f"API 请求异常: {e}", exc_info=True)
+                    yield f"[API 错误: {e}]"
+                    return
                 last_err = e
                 if attempt < self._retry_count:
                     log.warning(f"API 请求失败 (尝试 {attempt+1}/{self._retry_count+1}): {e}")
                     await asyncio.sleep(min(2 ** attempt, 8))
                     continue
-            except Exception as e:
-                log.error(f"API 请求异常: {e}", exc_info=True)
-                yield f"[API 错误: {e}]"
-                return
         if last_err:
             log.error(f"API 请求在 {self._retry_count+1} 次尝试后失败: {last_err}")
             yield f"[API 连接失败: {last_err}]"
 
+    async def abort(self, request_id: str):
+        """关闭对应的 HTTP 流，远端随即停止生成"""
+        self._aborted.add(request_id)
+        resp = self._streams.pop(request_id, None)
+        if resp is not None:
+            try:
+                await resp.aclose()
+            except Exception:
+                log.debug(f"关闭 API 流失败: {request_id}", exc_info=True)
+
     async def shutdown(self):
         await self.client.aclose()
         log.info("API 引擎已关闭")
@@ -9,14 +9,23 @@ class BaseEngine(ABC):
     @property
     @abstractmethod
     def engine_type(self) -> str:
-        """返回引擎类型标识，如 "vllm"、"transformers"、"api" """
+        """返回引擎类型标识，如 "vllm"、"transformers"、"llamacpp"、"api" """
         ...
 
     @abstractmethod
-    async def generate(self, messages: list[dict], images: list[str] | None = None) -> AsyncIterator[str]:
-        """流式生成文本，yield 每个增量文本片段"""
+    async def generate(self, messages: list[dict], images: list[str] | None = None,
+                       request_id: str | None = None) -> AsyncIterator[str]:
+        """流式生成文本，yield 每个增量文本片段；request_id 供 abort 定位请求"""
         ...
 
+    def memory_footprint(self) -> int | None:
+        """模型权重占用的字节数；无法获知时（如远程 API）返回 None"""
+        return None
+
+    async def abort(self, request_id: str):
+        """中止指定请求的生成，释放推理资源；默认无操作"""
+        pass
+
     @abstractmethod
     async def shutdown(self):
         """关闭引擎，释放资源"""
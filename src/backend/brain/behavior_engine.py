@@ -1,11 +1,13 @@
-"""行为引擎 — 多触发器 + LLM 生成支持"""
+"""行为引擎 — 多触发器 + LLM 生成支持，调度运行在 BrainService 事件循环上"""
 import asyncio
 import random
-import threading
-from datetime import datetime, time as dtime
-from apscheduler.schedulers.background import BackgroundScheduler
-from src.backend.core.config import get
+import time
+from collections import deque
+from datetime import datetime, timedelta, time as dtime
+from apscheduler.triggers.cron import CronTrigger
+from src.backend.core.config import get, resolve_path
 from src.backend.core.logger import get_logger
+from src.backend.services.task_queue import PRIORITY_PROACTIVE
 
 log = get_logger("behavior_engine")
 
@@ -42,75 +44,103 @@ _TEMPLATES = {
 
 
 class BehaviorEngine:
-    """行为引擎：支持多触发器类型和 LLM 生成消息。"""
+    """行为引擎：支持多触发器类型和 LLM 生成消息。
+
+    不再使用调度线程：interval / cron 由事件循环 call_later 定时，
+    idle 模式的计时器在 notify_user_input 时重置，无需每分钟轮询。
+    LLM 消息预先在后台队列中生成（含语音），触发时直接取用，不等待也不因推理繁忙而跳过。
+    """
 
     def __init__(self, socketio, brain_service):
         self._socketio = socketio
         self._brain_service = brain_service
-        self._scheduler = BackgroundScheduler(daemon=True)
+        self._loop: asyncio.AbstractEventLoop = brain_service._loop
+        self._timer: asyncio.TimerHandle | None = None
+        self._cron: CronTrigger | None = None
         self._running = False
-        self._lock = threading.Lock()
         self._daily_count = 0
         self._last_count_date = datetime.now().date()
-        self._last_user_input_time = datetime.now()
+        self._pool: deque[dict] = deque()  # 预生成的 {"text", "audio", "created_at"}
 
     @property
     def is_running(self) -> bool:
         return self._running
 
     def notify_user_input(self):
-        """用户发送消息时调用，重置无输入计时器"""
-        self._last_user_input_time = datetime.now()
+        """用户发送消息时调用，idle 模式下重置无输入计时器"""
+        if self._running and get("behavior.trigger_type", "interval") == "idle":
+            self._loop.call_soon_threadsafe(self._arm)
 
     def start(self):
-        with self._lock:
-            if self._running:
+        if self._running:
+            return
+        trigger_type = get("behavior.trigger_type", "interval")
+        self._cron = None
+        if trigger_type == "cron":
+            parts = get("behavior.cron_expression", "").split()
+            if len(parts) < 5:
+                log.warning("behavior.cron_expression 无效，行为引擎未启动")
                 return
-            self._scheduler = BackgroundScheduler(daemon=True)
-            trigger_type = get("behavior.trigger_type", "interval")
-
-            if trigger_type == "cron":
-                expr = get("behavior.cron_expression", "")
-                if expr:
-                    parts = expr.split()
-                    if len(parts) >= 5:
-                        self._scheduler.add_job(
-                            self._tick, "cron",
-                            minute=parts[0], hour=parts[1],
-                            day=parts[2], month=parts[3],
-                            day_of_week=parts[4],
-                            id="behavior_tick",
-                        )
-            elif trigger_type == "idle":
-                # 每分钟检查一次是否超过无输入阈值
-                self._scheduler.add_job(
-                    self._check_idle, "interval", minutes=1, id="behavior_idle_check",
-                )
-            else:
-                interval = get("behavior.interval_minutes", 30)
-                self._scheduler.add_job(
-                    self._tick, "interval", minutes=interval, id="behavior_tick",
+            try:
+                self._cron = CronTrigger(
+                    minute=parts[0], hour=parts[1], day=parts[2],
+                    month=parts[3], day_of_week=parts[4],
                 )
-
-            self._scheduler.start()
-            self._running = True
-            log.info("行为引擎已启动，触发类型=%s", trigger_type)
+            except ValueError:
+                log.warning("behavior.cron_expression 解析失败，行为引擎未启动", exc_info=True)
+                return
+        self._running = True
+        self._loop.call_soon_threadsafe(self._arm)
+        self._loop.call_soon_threadsafe(self._request_refill)
+        log.info("行为引擎已启动，触发类型=%s", trigger_type)
 
     def stop(self):
-        with self._lock:
-            if not self._running:
-                return
-            self._scheduler.shutdown(wait=False)
-            self._running = False
-            log.info("行为引擎已停止")
-
-    def _check_idle(self):
-        """检查无输入超时"""
-        timeout = get("behavior.idle_timeout_minutes", 10)
-        elapsed = (datetime.now() - self._last_user_input_time).total_seconds() / 60
-        if elapsed >= timeout:
-            self._tick()
-            self._last_user_input_time = datetime.now()  # 重置，避免连续触发
+        if not self._running:
+            return
+        self._running = False
+        self._loop.call_soon_threadsafe(self._shutdown)
+        log.info("行为引擎已停止")
+
+    # ---- 以下方法只在事件循环线程中执行 ----
+
+    def _disarm(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _shutdown(self):
+        self._disarm()
+        while self._pool:
+            _remove_audio(self._pool.popleft().get("audio"))
+
+    def _next_delay(self) -> float | None:
+        """距离下次触发的秒数"""
+        if self._cron is not None:
+            now = datetime.now(self._cron.timezone)
+            # 从 1 秒后开始找，避免定时器略早唤醒时再次命中刚触发的时刻
+            fire_time = self._cron.get_next_fire_time(None, now + timedelta(seconds=1))
+            return (fire_time - now).total_seconds() if fire_time else None
+        if get("behavior.trigger_type", "interval") == "idle":
+            return get("behavior.idle_timeout_minutes", 10) * 60
+        return get("behavior.interval_minutes", 30) * 60
+
+    def _arm(self):
+        self._disarm()
+        if not self._running:
+            return
+        delay = self._next_delay()
+        if delay is None:
+            log.info("行为引擎：cron 表达式没有后续触发时间")
+            return
+        self._timer = self._loop.call_later(max(1.0, delay), self._fire)
+
+    def _fire(self):
+        self._timer = None
+        if not self._running:
+            return
+        self._loop.create_task(self._tick())
+        # idle 模式触发后重新计时，避免连续触发
+        self._arm()
 
     def _in_quiet_hours(self) -> bool:
         """检查当前是否在安静时段"""
@@ -134,50 +164,77 @@ class BehaviorEngine:
             self._last_count_date = today
         return self._daily_count < get("behavior.max_daily_messages", 50)
 
-    def _generate_message(self) -> str | None:
-        """生成消息：优先 LLM，回退到模板"""
-        if get("behavior.llm_generation_enabled", False):
-            try:
-                if not self._brain_service.is_inferring and self._brain_service.engine:
-                    return self._generate_llm_message()
-            except Exception:
-                log.warning("LLM 生成主动消息失败，回退到模板", exc_info=True)
-
-        if get("behavior.message_templates_enabled", True):
-            categories = get("behavior.categories", list(_TEMPLATES.keys()))
-            pool = []
-            for cat in categories:
-                if cat in _TEMPLATES:
-                    pool.extend(_TEMPLATES[cat])
-            return random.choice(pool) if pool else None
+    def _template_message(self) -> str | None:
+        if not get("behavior.message_templates_enabled", True):
+            return None
+        categories = get("behavior.categories", list(_TEMPLATES.keys()))
+        pool = []
+        for cat in categories:
+            if cat in _TEMPLATES:
+                pool.extend(_TEMPLATES[cat])
+        return random.choice(pool) if pool else None
+
+    # ---- LLM 预生成池 ----
+
+    def _pool_target(self) -> int:
+        if not get("behavior.llm_generation_enabled", False):
+            return 0
+        return max(0, int(get("behavior.precompute_pool_size", 3)))
+
+    def _draw(self) -> dict | None:
+        """从预生成池取一条未过期的消息，过期条目连同音频一起丢弃"""
+        max_age = get("behavior.precompute_max_age_minutes", 180) * 60
+        now = time.time()
+        while self._pool:
+            item = self._pool.popleft()
+            if now - item["created_at"] <= max_age:
+                return item
+            _remove_audio(item.get("audio"))
         return None
 
-    def _generate_llm_message(self) -> str | None:
-        """调用 LLM 生成主动消息"""
-        import queue
+    def _request_refill(self):
+        if not self._running or self._brain_service.engine is None:
+            return
+        if len(self._pool) >= self._pool_target():
+            return
+        self._brain_service.tasks.submit(
+            "proactive_pool", self._refill, priority=PRIORITY_PROACTIVE, key="proactive_pool",
+        )
+
+    async def _refill(self):
+        """后台队列空闲时补满预生成池，被聊天抢占后从下一条继续"""
+        while self._running and len(self._pool) < self._pool_target():
+            text = await self._generate_llm_message()
+            if not text:
+                return
+            audio = await self._prepare_audio(text)
+            self._pool.append({"text": text, "audio": audio, "created_at": time.time()})
+            log.info(f"主动消息预生成池: {len(self._pool)}/{self._pool_target()}")
+
+    async def _generate_llm_message(self) -> str | None:
+        """调用 LLM 生成主动消息，仅在后台任务队列中执行"""
+        engine = self._brain_service.engine
+        if engine is None:
+            return None
         prompt = [
-            {"role": "system", "content": "你是一个温柔体贴的AI伴侣。请生成一条简短的主动问候消息（不超过30字），语气自然亲切。不要使用方括号或特殊标记。"},
+            {"role": "system", "content": "你是一个温柔体贴的AI伴侣。请生成一条简短的主动问候消息（不超过30字），语气自然亲切。不要使用方括号或特殊标记。消息会在稍后发送，不要提及具体时间或时段。"},
             {"role": "user", "content": "请生成一条主动消息。"},
         ]
-        q = queue.Queue()
+        result = ""
+        async for chunk in engine.generate(prompt):
+            result += chunk
+        return result.strip()[:100]
 
-        async def _gen():
-            result = ""
-            async for chunk in self._brain_service.engine.generate(prompt):
-                result += chunk
-            q.put(result.strip()[:100])
-
-        future = asyncio.run_coroutine_threadsafe(_gen(), self._brain_service._loop)
-        try:
-            return future.result(timeout=30)
-        except Exception:
+    @staticmethod
+    async def _prepare_audio(text: str) -> str | None:
+        from src.backend.services import get_perception
+        perc = get_perception()
+        if perc is None:
             return None
+        return await perc.prepare_audio(text)
 
-    def _tick(self):
-        """触发：检查条件，生成并推送消息。"""
-        if self._brain_service.is_inferring:
-            log.info("行为引擎：当前正在推理，跳过")
-            return
+    async def _tick(self):
+        """触发：检查条件，从预生成池或模板取消息立即推送，不等待推理。"""
         if self._in_quiet_hours():
             log.info("行为引擎：安静时段，跳过")
             return
@@ -185,17 +242,32 @@ class BehaviorEngine:
             log.info("行为引擎：已达每日上限，跳过")
             return
 
-        msg = self._generate_message()
-        if not msg:
+        item = self._draw() if self._pool_target() else None
+        self._request_refill()
+        if item is None:
+            if self._pool_target():
+                log.info("行为引擎：预生成池为空，使用模板消息")
+            item = {"text": self._template_message(), "audio": None}
+        if not item["text"]:
             return
 
         self._daily_count += 1
-        log.info("行为引擎：推送 -> %s", msg)
+        log.info("行为引擎：推送 -> %s", item["text"])
         try:
-            loop = asyncio.get_event_loop()
-            asyncio.run_coroutine_threadsafe(
-                self._socketio.emit("proactive_message", {"text": msg}, namespace="/ws/events"),
-                loop
+            await self._socketio.emit(
+                "proactive_message", {"text": item["text"], "audio": item["audio"] or ""},
+                namespace="/ws/events",
             )
         except Exception:
             log.warning("推送主动消息失败", exc_info=True)
+
+
+def _remove_audio(url: str | None):
+    """删除未被使用的预合成音频"""
+    if not url or not url.startswith("/audio/"):
+        return
+    path = resolve_path("data/tts_output") / url[len("/audio/"):]
+    try:
+        path.unlink(missing_ok=True)
+    except OSError:
+        log.debug(f"删除预合成音频失败: {path}", exc_info=True)
@@ -4,9 +4,13 @@ from datetime import datetime
 import json
 from src.backend.core.config import get, resolve_path
 from src.backend.core.logger import get_logger
+from src.backend.brain.diary_store import DiaryStore, TYPE_PREFIX, default_period_start
 
 log = get_logger("diary")
 
+# 层级汇总：周记读取日记，月记读取周记，年记读取月记
+_CHILD_TYPE = {"weekly": "daily", "monthly": "weekly", "yearly": "monthly"}
+
 
 class DiaryWriter:
     def __init__(self):
@@ -14,6 +18,7 @@ class DiaryWriter:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.state_file = self.output_dir / ".diary_state.json"
         self.state = self._load_state()
+        self.store = DiaryStore(self.output_dir)
 
     def _load_state(self) -> dict:
         """加载日记生成状态"""
@@ -55,6 +60,40 @@ class DiaryWriter:
         self.state[f"{diary_type}_last"] = datetime.now().isoformat()
         self._save_state()
 
+    def _period_start(self, diary_type: str, now: datetime) -> datetime:
+        """本篇覆盖的起点：上次生成该类型的时间，没有则取类型默认时段"""
+        last = self.state.get(f"{diary_type}_last")
+        if last:
+            try:
+                return datetime.fromisoformat(last)
+            except ValueError:
+                pass
+        start = default_period_start(diary_type, now.date())
+        return datetime.combine(start, datetime.min.time())
+
+    def _aggregate_source(self, diary_type: str, since: datetime) -> str | None:
+        """周/月/年记从下一层已保存的条目汇总，没有可用条目时返回 None"""
+        child = _CHILD_TYPE.get(diary_type)
+        if not child:
+            return None
+        entries = self.store.entries(child, since=since)
+        if not entries:
+            return None
+        max_chars = int(get("diary.aggregate_max_chars", 1500))
+        child_prefix = TYPE_PREFIX[child]
+        parts = []
+        for entry in entries:
+            body = self.store.read(entry)
+            if not body:
+                continue
+            if len(body) > max_chars:
+                body = body[:max_chars] + "…"
+            day = datetime.fromtimestamp(entry["created_at"]).strftime("%Y-%m-%d")
+            parts.append(f"### {child_prefix} {day}\n{body}")
+        if not parts:
+            return None
+        return f"以下是这段时间的{child_prefix}:\n\n" + "\n\n".join(parts)
+
     async def write(self, conversation: list[dict], engine, diary_type: str = "daily") -> str:
         """用 LLM 生成日记条目并保存
 
@@ -80,9 +119,14 @@ class DiaryWriter:
         if not custom_prompt:
             custom_prompt = self._get_default_prompt(diary_type)
 
+        now = datetime.now()
+        period_start = self._period_start(diary_type, now)
+        source = self._aggregate_source(diary_type, period_start)
+        if source is None:
+            source = self._format_conversation(conversation)
         diary_prompt = [
             {"role": "system", "content": custom_prompt},
-            {"role": "user", "content": self._format_conversation(conversation)},
+            {"role": "user", "content": source},
         ]
 
         chunks = []
@@ -90,13 +134,12 @@ class DiaryWriter:
             chunks.append(chunk)
         content = "".join(chunks)
 
-        now = datetime.now()
         # 根据日记类型使用不同的文件名前缀
-        type_prefix = {"daily": "日记", "weekly": "周记", "monthly": "月记", "yearly": "年记"}
-        prefix = type_prefix.get(diary_type, diary_type)
+        prefix = TYPE_PREFIX.get(diary_type, diary_type)
         path = self.output_dir / f"{prefix}_{now.strftime('%Y-%m-%d_%H%M%S')}.md"
         path.write_text(f"# {prefix} - {now.strftime('%Y年%m月%d日 %H:%M')}\n\n{content}\n", encoding="utf-8")
         log.info(f"{prefix}已保存: {path}")
+        self.store.add(diary_type, path, now, period_start.date(), now.date())
         self._update_state(diary_type)
         return content
 
@@ -111,8 +154,9 @@ class DiaryWriter:
         return prompts.get(diary_type, prompts["daily"])
 
     def _format_conversation(self, conversation: list[dict]) -> str:
+        ai_name = get("ai_name", "AI")
         lines = []
         for msg in conversation:
-            role = "用户" if msg["role"] == "user" else get("ai_name", "AI")
+            role = "用户" if msg["role"] == "user" else ai_name
             lines.append(f"{role}: {msg['content']}")
         return "以下是刚才的对话:\n" + "\n".join(lines)
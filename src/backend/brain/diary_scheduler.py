@@ -0,0 +1,125 @@
+"""日记调度 — 将日记生成移出聊天关键路径，定时或空闲时低优先级执行"""
+import asyncio
+import concurrent.futures
+from datetime import datetime, timedelta
+from src.backend.core.config import get
+from src.backend.core.logger import get_logger
+from src.backend.services.task_queue import PRIORITY_DIARY
+
+log = get_logger("diary_scheduler")
+
+DIARY_TYPES = ("daily", "weekly", "monthly", "yearly")
+
+
+class DiaryScheduler:
+    """运行在 BrainService 事件循环上的日记调度器。
+
+    - diary.auto_generate=true：每天 diary.generation_time 生成
+    - 否则：对话结束后空闲 diary.idle_delay_minutes 分钟生成
+    到点后提交到 BrainService 的后台任务队列；用户请求到达时由队列抢占并在空闲后重跑，
+    已写完的日记类型不会重复生成。
+    """
+
+    def __init__(self, brain_service):
+        self._brain = brain_service
+        self._loop: asyncio.AbstractEventLoop = brain_service._loop
+        self._timer: asyncio.TimerHandle | None = None
+        self._future: concurrent.futures.Future | None = None
+        self._dirty = False  # 自上次生成后是否有新对话
+        self._written: set[str] = set()  # 本轮已完成的日记类型，被抢占重跑时跳过
+        self._running = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self):
+        self._running = True
+        self._loop.call_soon_threadsafe(self._schedule_daily)
+        mode = "定时 " + get("diary.generation_time", "23:00") if get("diary.auto_generate", False) else "空闲"
+        log.info(f"日记调度已启动，模式={mode}")
+
+    def stop(self):
+        self._running = False
+        self._loop.call_soon_threadsafe(self._cancel_all)
+
+    def notify_activity(self):
+        """一轮对话结束时调用：标记有新内容，空闲模式下重置空闲计时"""
+        self._loop.call_soon_threadsafe(self._on_activity)
+
+    # ---- 以下方法只在事件循环线程中执行 ----
+
+    def _cancel_all(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._future and not self._future.done():
+            self._future.cancel()
+
+    def _set_timer(self, delay: float):
+        if self._timer:
+            self._timer.cancel()
+        self._timer = self._loop.call_later(max(0.0, delay), self._fire)
+
+    def _schedule_daily(self):
+        if not self._running or not get("diary.auto_generate", False):
+            return
+        try:
+            hour, minute = map(int, get("diary.generation_time", "23:00").split(":"))
+        except ValueError:
+            log.warning("diary.generation_time 格式错误，应为 HH:MM，已回退到 23:00")
+            hour, minute = 23, 0
+        now = datetime.now()
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        self._set_timer((target - now).total_seconds())
+
+    def _schedule_idle(self):
+        self._set_timer(get("diary.idle_delay_minutes", 10) * 60)
+
+    def _on_activity(self):
+        self._dirty = True
+        if self._running and not get("diary.auto_generate", False):
+            self._schedule_idle()
+
+    def _fire(self):
+        self._timer = None
+        if not self._running:
+            return
+        if not (self._dirty or get("diary.auto_generate", False)):
+            self._schedule_daily()
+            return
+        self._future = self._brain.tasks.submit("diary", self._generate_all, priority=PRIORITY_DIARY, key="diary")
+        self._future.add_done_callback(lambda f: self._loop.call_soon_threadsafe(self._on_done, f))
+
+    def _on_done(self, future: concurrent.futures.Future):
+        if future is self._future:
+            self._future = None
+        if future.cancelled():
+            # 被停止，或连续被抢占超过上限
+            if self._running:
+                log.info("日记生成未完成，将在下个空闲窗口重试")
+                self._schedule_idle()
+            return
+        self._dirty = False
+        self._written.clear()
+        self._schedule_daily()
+
+    async def _generate_all(self):
+        brain = self._brain
+        if not brain.diary or not brain.engine or not get("diary.enabled", True):
+            return
+        history = list(brain.history)
+        if not history:
+            return
+        for diary_type in DIARY_TYPES:
+            if diary_type in self._written:
+                continue
+            try:
+                await brain.diary.write(history, brain.engine, diary_type)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.debug(f"{diary_type} 日记写入跳过", exc_info=True)
+            self._written.add(diary_type)
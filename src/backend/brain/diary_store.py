@@ -0,0 +1,230 @@
+"""日记索引 — SQLite 元数据表（类型、覆盖时段、大小）+ FTS5 全文检索"""
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from src.backend.core.logger import get_logger
+
+log = get_logger("diary_store")
+
+TYPE_PREFIX = {"daily": "日记", "weekly": "周记", "monthly": "月记", "yearly": "年记"}
+_PREFIX_TYPE = {v: k for k, v in TYPE_PREFIX.items()}
+_FILE_RE = re.compile(r"^(日记|周记|月记|年记)_(\d{4}-\d{2}-\d{2})_(\d{6})\.md$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    filename TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    period_start TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_type_created ON entries(type, created_at);
+CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created_at);
+"""
+
+# trigram 分词对中文按子串匹配，需要 SQLite >= 3.34；查询词少于 3 个字时退化为 LIKE
+_FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(content, tokenize='trigram')"
+_FTS_MIN_QUERY = 3
+_SNIPPET_RADIUS = 40
+
+
+def default_period_start(diary_type: str, end: date) -> date:
+    """未知上次生成时间时，各类型默认覆盖的起始日期"""
+    if diary_type == "weekly":
+        return end - timedelta(days=6)
+    if diary_type == "monthly":
+        return end.replace(day=1)
+    if diary_type == "yearly":
+        return end.replace(month=1, day=1)
+    return end
+
+
+class DiaryStore:
+    """日记目录的索引，避免每次按文件名扫描整个目录"""
+
+    def __init__(self, diary_dir: Path):
+        self.dir = Path(diary_dir)
+        self.db_path = self.dir / ".diary_index.sqlite3"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+            try:
+                self._conn.execute(_FTS_SCHEMA)
+                self._fts = True
+            except sqlite3.OperationalError:
+                log.warning("当前 SQLite 不支持 FTS5 trigram，日记搜索退化为 LIKE 扫描")
+                self._fts = False
+            empty = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0
+        if empty:
+            self.rebuild()
+        self._sync_fts()
+
+    def _sync_fts(self):
+        """为尚未进入全文索引的条目补建索引（升级或索引损坏后）"""
+        if not self._fts:
+            return
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, filename FROM entries WHERE id NOT IN (SELECT rowid FROM entries_fts)"
+            ).fetchall()
+        for row in rows:
+            self._index_content(row["id"], self.read(dict(row)))
+        if rows:
+            log.info(f"日记全文索引已补建 {len(rows)} 条")
+
+    def _index_content(self, entry_id: int, content: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO entries_fts (rowid, content) VALUES (?, ?)",
+                               (entry_id, content))
+            self._conn.commit()
+
+    def rebuild(self) -> int:
+        """扫描目录补全索引（首次启用或索引丢失时），返回新增条数"""
+        added = 0
+        for path in sorted(self.dir.glob("*.md")):
+            m = _FILE_RE.match(path.name)
+            if not m:
+                continue
+            diary_type = _PREFIX_TYPE[m.group(1)]
+            created = datetime.strptime(f"{m.group(2)}_{m.group(3)}", "%Y-%m-%d_%H%M%S")
+            end = created.date()
+            if self.add(diary_type, path, created, default_period_start(diary_type, end), end):
+                added += 1
+        if added:
+            log.info(f"日记索引已重建，新增 {added} 条")
+        return added
+
+    def add(self, diary_type: str, path: Path, created_at: datetime,
+            period_start: date, period_end: date) -> bool:
+        path = Path(path)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            size = 0
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO entries (type, filename, created_at, period_start, period_end, size) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (diary_type, path.name, created_at.timestamp(), period_start.isoformat(),
+                 period_end.isoformat(), size),
+            )
+            self._conn.commit()
+            added = cur.rowcount > 0
+            entry_id = cur.lastrowid
+        if added and self._fts:
+            self._index_content(entry_id, self.read({"filename": path.name}))
+        return added
+
+    def get(self, entry_id: int) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return dict(row) if row else None
+
+    @staticmethod
+    def _filters(diary_type: str | None, since: datetime | None, until: datetime | None,
+                 alias: str = "entries") -> tuple[str, list]:
+        clauses, args = [], []
+        if diary_type:
+            clauses.append(f"{alias}.type = ?")
+            args.append(diary_type)
+        if since is not None:
+            clauses.append(f"{alias}.created_at >= ?")
+            args.append(since.timestamp())
+        if until is not None:
+            clauses.append(f"{alias}.created_at <= ?")
+            args.append(until.timestamp())
+        return (" AND ".join(clauses), args)
+
+    def list_page(self, diary_type: str | None = None, since: datetime | None = None,
+                  until: datetime | None = None, offset: int = 0, limit: int = 20) -> tuple[int, list[dict]]:
+        """分页列出条目（最新在前），返回 (总数, 当前页)"""
+        where, args = self._filters(diary_type, since, until)
+        where = f" WHERE {where}" if where else ""
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM entries{where}", args).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM entries{where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                args + [limit, offset],
+            ).fetchall()
+        return total, [dict(r) for r in rows]
+
+    def search(self, query: str, diary_type: str | None = None, offset: int = 0,
+               limit: int = 20) -> tuple[int, list[dict]]:
+        """全文检索，返回 (命中总数, 当前页)，每条附带 snippet"""
+        if self._fts and len(query) >= _FTS_MIN_QUERY:
+            where, args = self._filters(diary_type, None, None, alias="e")
+            extra = f" AND {where}" if where else ""
+            match = '"' + query.replace('"', '""') + '"'
+            base = f"FROM entries_fts f JOIN entries e ON e.id = f.rowid WHERE entries_fts MATCH ?{extra}"
+            select = (f"SELECT e.*, snippet(entries_fts, 0, '[', ']', '…', 16) AS snippet {base} "
+                      f"ORDER BY e.created_at DESC LIMIT ? OFFSET ?")
+            with self._lock:
+                total = self._conn.execute(f"SELECT COUNT(*) {base}", [match] + args).fetchone()[0]
+                rows = self._conn.execute(select, [match] + args + [limit, offset]).fetchall()
+            return total, [dict(r) for r in rows]
+        return self._search_like(query, diary_type, offset, limit)
+
+    def _search_like(self, query: str, diary_type: str | None, offset: int,
+                     limit: int) -> tuple[int, list[dict]]:
+        if self._fts:
+            where, args = self._filters(diary_type, None, None, alias="e")
+            extra = f" AND {where}" if where else ""
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            base = f"FROM entries_fts f JOIN entries e ON e.id = f.rowid WHERE f.content LIKE ? ESCAPE '\\'{extra}"
+            with self._lock:
+                total = self._conn.execute(f"SELECT COUNT(*) {base}", [pattern] + args).fetchone()[0]
+                rows = self._conn.execute(
+                    f"SELECT e.*, f.content AS content {base} ORDER BY e.created_at DESC LIMIT ? OFFSET ?",
+                    [pattern] + args + [limit, offset],
+                ).fetchall()
+            items = [dict(r) for r in rows]
+        else:
+            # 无 FTS：逐篇读取文件匹配，仅作兜底
+            matched = []
+            for entry in self.list_page(diary_type, offset=0, limit=-1)[1]:
+                content = self.read(entry)
+                if query in content:
+                    matched.append({**entry, "content": content})
+            total, items = len(matched), matched[offset:offset + limit]
+        for item in items:
+            item["snippet"] = self._make_snippet(item.pop("content", ""), query)
+        return total, items
+
+    @staticmethod
+    def _make_snippet(content: str, query: str) -> str:
+        idx = content.find(query)
+        if idx < 0:
+            return content[:_SNIPPET_RADIUS * 2]
+        start = max(0, idx - _SNIPPET_RADIUS)
+        end = min(len(content), idx + len(query) + _SNIPPET_RADIUS)
+        prefix = "…" if start > 0 else ""
+        suffix = "…" if end < len(content) else ""
+        return f"{prefix}{content[start:idx]}[{query}]{content[idx + len(query):end]}{suffix}"
+
+    def entries(self, diary_type: str, since: datetime | None = None,
+                until: datetime | None = None) -> list[dict]:
+        """按创建时间升序返回指定类型的条目"""
+        where, args = self._filters(diary_type, since, until)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM entries WHERE {where} ORDER BY created_at", args).fetchall()
+        return [dict(r) for r in rows]
+
+    def read(self, entry: dict) -> str:
+        """读取正文，去掉首行标题"""
+        try:
+            text = (self.dir / entry["filename"]).read_text(encoding="utf-8")
+        except OSError:
+            return ""
+        if text.startswith("# "):
+            text = text.split("\n", 1)[1] if "\n" in text else ""
+        return text.strip()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,8 +1,9 @@
-"""LLM 推理引擎：vLLM / Transformers / API 多模"""
+"""LLM 推理引擎：vLLM / Transformers / llama.cpp / API 多模"""
+import threading
 import uuid
 from typing import AsyncIterator
 from src.backend.brain.base_engine import BaseEngine
-from src.backend.core.config import get
+from src.backend.core.config import get, sampling
 from src.backend.core.logger import get_logger
 
 log = get_logger("engine")
@@ -18,6 +19,69 @@ def _load_and_resize(path: str) -> "Image.Image":
     return img
 
 
+def _cancel_criteria(event: threading.Event):
+    """构造在 event 置位后终止 model.generate 的 StoppingCriteria"""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class _EventStop(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+    return StoppingCriteriaList([_EventStop()])
+
+
+def _speculative_mode() -> str:
+    """读取 brain.speculative_mode：none / ngram（prompt lookup）/ draft（小模型草稿）"""
+    mode = str(get("brain.speculative_mode", "none") or "none").lower()
+    if mode not in ("none", "ngram", "draft"):
+        log.warning(f"未知的 brain.speculative_mode: {mode}，已禁用投机解码")
+        return "none"
+    if mode == "draft" and not get("brain.speculative_draft_model", ""):
+        log.warning("speculative_mode=draft 但未配置 brain.speculative_draft_model，已禁用投机解码")
+        return "none"
+    return mode
+
+
+def _vllm_speculative_config() -> dict | None:
+    mode = _speculative_mode()
+    num_tokens = get("brain.speculative_num_tokens", 5)
+    if mode == "ngram":
+        return {
+            "method": "ngram",
+            "num_speculative_tokens": num_tokens,
+            "prompt_lookup_max": get("brain.speculative_ngram_max", 4),
+        }
+    if mode == "draft":
+        return {
+            "model": get("brain.speculative_draft_model"),
+            "num_speculative_tokens": num_tokens,
+        }
+    return None
+
+
+_QUANT_MODES = ("none", "8bit", "4bit", "gptq", "awq", "cpu_int8")
+
+
+def _quantization_mode() -> str:
+    """读取 brain.quantization，仅 Transformers 引擎使用"""
+    mode = str(get("brain.quantization", "none") or "none").lower()
+    if mode not in _QUANT_MODES:
+        log.warning(f"未知的 brain.quantization: {mode}，按不量化加载")
+        return "none"
+    return mode
+
+
+def _module_bytes(model) -> int:
+    """按 state_dict 统计权重字节数，动态量化后的 Linear 以打包参数元组形式出现"""
+    total = 0
+    for value in model.state_dict().values():
+        for t in (value if isinstance(value, tuple) else (value,)):
+            if hasattr(t, "element_size"):
+                total += t.numel() * t.element_size()
+    return total
+
+
 class VLLMEngine(BaseEngine):
 
     @property
@@ -32,19 +96,27 @@ class VLLMEngine(BaseEngine):
 
         model_path = get("brain.model_path")
         self.processor = AutoProcessor.from_pretrained(model_path, trust_remote_code=True)
+        extra_args = {}
+        spec = _vllm_speculative_config()
+        if spec:
+            extra_args["speculative_config"] = spec
         args = AsyncEngineArgs(
             model=model_path,
             gpu_memory_utilization=get("brain.gpu_memory_utilization", 0.85),
             max_model_len=get("brain.max_model_len", 8192),
             trust_remote_code=True,
             dtype="auto",
+            **extra_args,
         )
         self.engine = _AsyncEngine.from_engine_args(args)
         log.info(f"vLLM 引擎已加载: {model_path}")
+        if spec:
+            log.info(f"vLLM 投机解码已启用: {spec}")
 
-    async def generate(self, messages: list[dict], images: list[str] | None = None) -> AsyncIterator[str]:
-        enable_thinking = get("brain.enable_thinking", False)
-        extra = {"enable_thinking": enable_thinking} if enable_thinking else {}
+    async def generate(self, messages: list[dict], images: list[str] | None = None,
+                       request_id: str | None = None) -> AsyncIterator[str]:
+        sp = sampling()
+        extra = {"enable_thinking": True} if sp.enable_thinking else {}
         text = self.processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True, **extra)
 
         mm_data = None
@@ -63,26 +135,39 @@ class VLLMEngine(BaseEngine):
             mm_data = {"image": pil_images}
 
         params = self.SamplingParams(
-            temperature=get("brain.temperature", 0.7),
-            max_tokens=get("brain.max_tokens", 4096),
-            top_p=get("brain.top_p", 0.9),
-            repetition_penalty=get("brain.repetition_penalty", 1.0),
-            frequency_penalty=get("brain.frequency_penalty", 0.0),
-            presence_penalty=get("brain.presence_penalty", 0.0),
-            top_k=get("brain.top_k", 50),
-            min_p=get("brain.min_p", 0.0),
-            stop=get("brain.stop_sequences", None) or None,
+            temperature=sp.temperature,
+            max_tokens=sp.max_tokens,
+            top_p=sp.top_p,
+            repetition_penalty=sp.repetition_penalty,
+            frequency_penalty=sp.frequency_penalty,
+            presence_penalty=sp.presence_penalty,
+            top_k=sp.top_k,
+            min_p=sp.min_p,
+            stop=list(sp.stop_sequences) or None,
         )
-        request_id = uuid.uuid4().hex
+        request_id = request_id or uuid.uuid4().hex
 
         results = self.engine.generate(text, params, request_id=request_id) if not mm_data else self.engine.generate({"prompt": text, "multi_modal_data": mm_data}, params, request_id=request_id)
         prev_len = 0
-        async for result in results:
-            text_out = result.outputs[0].text
-            delta = text_out[prev_len:]
-            prev_len = len(text_out)
-            if delta:
-                yield delta
+        finished = False
+        try:
+            async for result in results:
+                text_out = result.outputs[0].text
+                delta = text_out[prev_len:]
+                prev_len = len(text_out)
+                finished = result.finished
+                if delta:
+                    yield delta
+        finally:
+            # 消费方提前退出（断开/取消）时中止调度器中的请求，立即释放 KV cache
+            if not finished:
+                await self.abort(request_id)
+
+    async def abort(self, request_id: str):
+        try:
+            await self.engine.abort(request_id)
+        except Exception:
+            log.debug(f"vLLM 中止请求失败: {request_id}", exc_info=True)
 
     async def shutdown(self):
         pass
@@ -100,22 +185,84 @@ class TransformersEngine(BaseEngine):
 
         model_path = get("brain.model_path")
         self.processor = AutoProcessor.from_pretrained(model_path, trust_remote_code=True)
-        self.model = AutoModelForImageTextToText.from_pretrained(
-            model_path,
-            dtype=torch.bfloat16,
-            device_map="auto",
-            trust_remote_code=True,
-        )
-        log.info(f"模型 dtype: {self.model.dtype}, 设备: {self.model.device}")
+        self.quantization = _quantization_mode()
+        load_kwargs = self._load_kwargs(torch)
+        self.model = AutoModelForImageTextToText.from_pretrained(model_path, **load_kwargs)
+        if self.quantization in ("gptq", "awq") and getattr(self.model.config, "quantization_config", None) is None:
+            log.warning(f"brain.quantization={self.quantization}，但模型目录中没有量化配置，按原精度运行")
+        if self.quantization == "cpu_int8":
+            # 无 GPU 时的回退：Linear 层动态量化为 int8，激活按需量化
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        log.info(f"模型 dtype: {self.model.dtype}, 设备: {self.model.device}, 量化: {self.quantization}")
         log.info(f"Transformers 引擎已加载: {model_path}")
+        self._cancel_events: dict[str, threading.Event] = {}
+
+        # 投机解码：draft 模式加载小模型作为 assistant_model，需与主模型共用分词器
+        self.speculative_mode = _speculative_mode()
+        self.assistant_model = None
+        if self.speculative_mode == "draft":
+            from transformers import AutoModelForCausalLM
+            draft_path = get("brain.speculative_draft_model")
+            try:
+                self.assistant_model = AutoModelForCausalLM.from_pretrained(
+                    draft_path,
+                    dtype=load_kwargs["dtype"],
+                    device_map=load_kwargs["device_map"],
+                    trust_remote_code=True,
+                )
+                log.info(f"投机解码草稿模型已加载: {draft_path}")
+            except Exception:
+                log.warning(f"草稿模型加载失败，已禁用投机解码: {draft_path}", exc_info=True)
+                self.speculative_mode = "none"
+        elif self.speculative_mode == "ngram":
+            log.info("投机解码已启用: prompt lookup")
+
+        self._footprint = self._measure_footprint()
+        if self._footprint:
+            log.info(f"模型权重占用: {self._footprint / 1024 ** 3:.2f} GB")
+
+    def _load_kwargs(self, torch) -> dict:
+        kwargs = {"dtype": torch.bfloat16, "device_map": "auto", "trust_remote_code": True}
+        mode = self.quantization
+        if mode == "8bit":
+            from transformers import BitsAndBytesConfig
+            kwargs["quantization_config"] = BitsAndBytesConfig(load_in_8bit=True)
+        elif mode == "4bit":
+            from transformers import BitsAndBytesConfig
+            kwargs["quantization_config"] = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_compute_dtype=torch.bfloat16,
+                bnb_4bit_use_double_quant=True,
+            )
+        elif mode in ("gptq", "awq"):
+            # 权重已离线量化，量化参数从 checkpoint 的 quantization_config 读取
+            kwargs["dtype"] = torch.float16
+        elif mode == "cpu_int8":
+            kwargs["dtype"] = torch.float32
+            kwargs["device_map"] = "cpu"
+        return kwargs
 
-    async def generate(self, messages: list[dict], images: list[str] | None = None) -> AsyncIterator[str]:
-        import torch, asyncio
-        from threading import Thread
+    def _measure_footprint(self) -> int | None:
+        try:
+            models = [m for m in (self.model, self.assistant_model) if m is not None]
+            if self.quantization == "cpu_int8":
+                return sum(_module_bytes(m) for m in models)
+            return sum(m.get_memory_footprint() for m in models)
+        except Exception:
+            log.debug("统计模型显存占用失败", exc_info=True)
+            return None
+
+    def memory_footprint(self) -> int | None:
+        return self._footprint
+
+    async def generate(self, messages: list[dict], images: list[str] | None = None,
+                       request_id: str | None = None) -> AsyncIterator[str]:
+        import asyncio
         from transformers import TextIteratorStreamer
 
-        enable_thinking = get("brain.enable_thinking", False)
-        extra = {"enable_thinking": enable_thinking} if enable_thinking else {}
+        sp = sampling()
+        extra = {"enable_thinking": True} if sp.enable_thinking else {}
         text = self.processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True, **extra)
 
         if images:
@@ -125,27 +272,59 @@ class TransformersEngine(BaseEngine):
             inputs = self.processor(text=text, return_tensors="pt").to(self.model.device)
         streamer = TextIteratorStreamer(self.processor, skip_prompt=True, skip_special_tokens=True)
 
-        temp = get("brain.temperature", 0.7)
         gen_kwargs = {
             **inputs,
             "streamer": streamer,
-            "max_new_tokens": get("brain.max_tokens", 4096),
-            "temperature": temp,
-            "top_p": get("brain.top_p", 0.9),
-            "do_sample": get("brain.do_sample", True) if temp > 0 else False,
-            "repetition_penalty": get("brain.repetition_penalty", 1.0),
-            "top_k": get("brain.top_k", 50),
+            "max_new_tokens": sp.max_tokens,
+            "temperature": sp.temperature,
+            "top_p": sp.top_p,
+            "do_sample": sp.do_sample if sp.temperature > 0 else False,
+            "repetition_penalty": sp.repetition_penalty,
+            "top_k": sp.top_k,
         }
-        thread = Thread(target=self.model.generate, kwargs=gen_kwargs)
+        # 辅助生成只支持纯文本输入，带图片时回退到普通解码
+        if not images:
+            gen_kwargs.update(self._speculative_kwargs())
+        request_id = request_id or uuid.uuid4().hex
+        cancel_event = threading.Event()
+        self._cancel_events[request_id] = cancel_event
+        gen_kwargs["stopping_criteria"] = _cancel_criteria(cancel_event)
+        thread = threading.Thread(target=self.model.generate, kwargs=gen_kwargs, daemon=True)
         thread.start()
 
-        for chunk in streamer:
-            if chunk:
-                yield chunk
-                await asyncio.sleep(0)
+        try:
+            # streamer.__next__ 会阻塞等待下一个 token，放到线程里取，避免卡住事件循环导致取消无法送达
+            it = iter(streamer)
+            while True:
+                chunk = await asyncio.to_thread(next, it, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    yield chunk
+        finally:
+            # 正常结束时无影响；提前退出时让 generate 线程在下一步停止
+            cancel_event.set()
+            self._cancel_events.pop(request_id, None)
         await asyncio.to_thread(thread.join)
 
+    def _speculative_kwargs(self) -> dict:
+        num_tokens = get("brain.speculative_num_tokens", 5)
+        if self.speculative_mode == "ngram":
+            return {
+                "prompt_lookup_num_tokens": num_tokens,
+                "max_matching_ngram_size": get("brain.speculative_ngram_max", 4),
+            }
+        if self.speculative_mode == "draft" and self.assistant_model is not None:
+            return {"assistant_model": self.assistant_model, "num_assistant_tokens": num_tokens}
+        return {}
+
+    async def abort(self, request_id: str):
+        event = self._cancel_events.get(request_id)
+        if event is not None:
+            event.set()
+
     async def shutdown(self):
+        self.assistant_model = None
         del self.model
         import torch
         torch.cuda.empty_cache()
@@ -159,6 +338,10 @@ def create_engine() -> BaseEngine:
         from src.backend.brain.api_engine import APIEngine
         return APIEngine()
 
+    if engine_type == "llamacpp":
+        from src.backend.brain.llamacpp_engine import LlamaCppEngine
+        return LlamaCppEngine()
+
     if engine_type == "vllm":
         if sys.platform == "win32":
             log.warning("vLLM 不支持 Windows，降级到 Transformers")
@@ -0,0 +1,159 @@
+"""llama.cpp 引擎：通过 llama-cpp-python 在 CPU（可选部分 GPU 卸载）上运行 GGUF 模型"""
+import asyncio
+import os
+import threading
+import uuid
+from typing import AsyncIterator
+
+try:
+    import llama_cpp
+except ImportError:
+    llama_cpp = None
+
+from src.backend.brain.base_engine import BaseEngine
+from src.backend.core.config import get, sampling
+from src.backend.core.logger import get_logger
+
+log = get_logger("engine.llamacpp")
+
+_END = object()
+
+
+def _default_threads() -> int:
+    """默认使用物理核心数，超线程对 llama.cpp 的解码速度帮助不大"""
+    try:
+        import psutil
+        cores = psutil.cpu_count(logical=False)
+    except Exception:
+        cores = None
+    return max(1, cores or os.cpu_count() or 1)
+
+
+class LlamaCppEngine(BaseEngine):
+    """加载 brain.model_path 指向的 .gguf 文件。
+
+    llama.cpp 的上下文不支持并发，生成在独立线程中串行执行；
+    前缀 KV 状态通过 LlamaRAMCache 在多轮对话及后台任务间复用。
+    """
+
+    def __init__(self):
+        if llama_cpp is None:
+            raise ImportError("llama-cpp-python 未安装，无法启动 llamacpp 引擎")
+        model_path = get("brain.model_path", "")
+        if not model_path or not os.path.isfile(model_path):
+            raise ValueError(f"brain.model_path 应指向 GGUF 文件: {model_path!r}")
+        self.model_path = model_path
+        threads = int(get("brain.llamacpp_threads", 0)) or _default_threads()
+        self.llm = llama_cpp.Llama(
+            model_path=model_path,
+            n_ctx=get("brain.context_length", 8192),
+            n_threads=threads,
+            n_threads_batch=threads,
+            n_gpu_layers=get("brain.llamacpp_gpu_layers", 0),
+            use_mmap=get("brain.llamacpp_use_mmap", True),
+            verbose=False,
+        )
+        cache_mb = get("brain.llamacpp_cache_mb", 512)
+        if cache_mb > 0:
+            self.llm.set_cache(llama_cpp.LlamaRAMCache(capacity_bytes=int(cache_mb) << 20))
+        self._lock = threading.Lock()
+        self._cancel_events: dict[str, threading.Event] = {}
+        self._warned_images = False
+        log.info(f"llama.cpp 引擎已加载: {model_path}（线程 {threads}，提示缓存 {cache_mb} MB）")
+
+    @property
+    def engine_type(self) -> str:
+        return "llamacpp"
+
+    @staticmethod
+    def _completion_kwargs() -> dict:
+        sp = sampling()
+        return {
+            "temperature": sp.temperature,
+            "max_tokens": sp.max_tokens,
+            "top_p": sp.top_p,
+            "top_k": sp.top_k,
+            "min_p": sp.min_p,
+            "repeat_penalty": sp.repetition_penalty,
+            "frequency_penalty": sp.frequency_penalty,
+            "presence_penalty": sp.presence_penalty,
+            "stop": list(sp.stop_sequences) or None,
+        }
+
+    def _run(self, messages: list[dict], cancel_event: threading.Event, put):
+        """在工作线程中串行生成，逐段通过 put 投递到事件循环"""
+        try:
+            with self._lock:
+                if cancel_event.is_set():
+                    return
+                stream = self.llm.create_chat_completion(messages, stream=True, **self._completion_kwargs())
+                try:
+                    for chunk in stream:
+                        if cancel_event.is_set():
+                            break
+                        text = chunk["choices"][0]["delta"].get("content")
+                        if text:
+                            put(text)
+                finally:
+                    stream.close()
+        except Exception as e:
+            put(e)
+        finally:
+            put(_END)
+
+    async def generate(self, messages: list[dict], images: list[str] | None = None,
+                       request_id: str | None = None) -> AsyncIterator[str]:
+        if images and not self._warned_images:
+            log.warning("llamacpp 引擎不支持图片输入，已忽略")
+            self._warned_images = True
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                cancel_event.set()
+
+        request_id = request_id or uuid.uuid4().hex
+        cancel_event = threading.Event()
+        self._cancel_events[request_id] = cancel_event
+        thread = threading.Thread(target=self._run, args=(messages, cancel_event, put),
+                                  name="llamacpp-generate", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # 提前退出时让生成线程在下一个 token 处停止并释放锁
+            cancel_event.set()
+            self._cancel_events.pop(request_id, None)
+
+    async def abort(self, request_id: str):
+        event = self._cancel_events.get(request_id)
+        if event is not None:
+            event.set()
+
+    def memory_footprint(self) -> int | None:
+        # 权重通过 mmap 映射，按 GGUF 文件大小估算
+        try:
+            return os.path.getsize(self.model_path)
+        except OSError:
+            return None
+
+    async def shutdown(self):
+        for event in list(self._cancel_events.values()):
+            event.set()
+        # 等进行中的生成退出后再释放模型
+        await asyncio.to_thread(self._lock.acquire)
+        try:
+            self.llm.close()
+        except AttributeError:
+            pass
+        finally:
+            self._lock.release()
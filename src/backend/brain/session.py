@@ -7,6 +7,7 @@ import time
 from pathlib import Path
 from src.backend.core.config import get, resolve_path
 from src.backend.core.logger import get_logger
+from src.backend.core.metrics import SESSION_SAVE_SECONDS
 
 log = get_logger("session")
 
@@ -21,6 +22,7 @@ class SessionManager:
         self.current_id: str | None = None
         self._lock = threading.RLock()  # 并发保护锁
         self.index: list[dict] = self._load_index()
+        self._migrate_title_sources()
 
     @staticmethod
     def _validate_session_id(sid: str) -> bool:
@@ -47,6 +49,40 @@ class SessionManager:
                 return json.loads(self.index_file.read_text("utf-8"))
             return []
 
+    @staticmethod
+    def _default_title(data: dict) -> str:
+        """未改名时的标题：首条用户消息截取前 20 字"""
+        for m in data.get("messages", []):
+            if m["role"] == "user":
+                return m["content"][:20]
+        return "新对话"
+
+    def _migrate_title_sources(self):
+        """补全旧版会话缺失的 title_source：标题与首条消息截取不一致的视为用户改名"""
+        with self._lock:
+            changed = False
+            for entry in self.index:
+                if "title_source" in entry or not self._validate_session_id(entry.get("id", "")):
+                    continue
+                path = self.dir / f"{entry['id']}.json"
+                source = "auto"
+                try:
+                    data = json.loads(path.read_text("utf-8")) if path.exists() else None
+                except (OSError, ValueError):
+                    log.warning(f"读取会话失败: {entry['id']}", exc_info=True)
+                    continue
+                if data is not None:
+                    source = data.get("title_source")
+                    if source is None:
+                        source = "auto" if data.get("title") == self._default_title(data) else "user"
+                        data["title_source"] = source
+                        self._atomic_write(path, json.dumps(data, ensure_ascii=False, indent=2))
+                entry["title_source"] = source
+                changed = True
+            if changed:
+                self._save_index()
+                log.info("已为旧版会话补全标题来源")
+
     def _save_index(self):
         # 调用者必须已持有 self._lock
         self._atomic_write(
@@ -59,12 +95,13 @@ class SessionManager:
             # 使用 secrets.token_hex(16) 生成 32 位十六进制 ID
             sid = secrets.token_hex(16)
             now = time.time()
-            data = {"id": sid, "title": "新对话", "created_at": now, "updated_at": now, "messages": []}
+            data = {"id": sid, "title": "新对话", "title_source": "auto",
+                    "created_at": now, "updated_at": now, "messages": []}
             self._atomic_write(
                 self.dir / f"{sid}.json",
                 json.dumps(data, ensure_ascii=False, indent=2)
             )
-            self.index.insert(0, {"id": sid, "title": "新对话", "updated_at": now})
+            self.index.insert(0, {"id": sid, "title": "新对话", "title_source": "auto", "updated_at": now})
             self._save_index()
             self.current_id = sid
             return sid
@@ -82,7 +119,7 @@ class SessionManager:
             return data.get("messages", [])
 
     def save_messages(self, messages: list[dict]):
-        with self._lock:
+        with self._lock, SESSION_SAVE_SECONDS.time():
             if not self.current_id:
                 return
             path = self.dir / f"{self.current_id}.json"
@@ -91,10 +128,12 @@ class SessionManager:
             data = json.loads(path.read_text("utf-8"))
             data["messages"] = messages
             data["updated_at"] = time.time()
-            for m in messages:
-                if m["role"] == "user":
-                    data["title"] = m["content"][:20]
-                    break
+            # 仅在标题仍为自动截取时更新，不覆盖 LLM 生成或用户手动修改的标题
+            if data.get("title_source", "auto") == "auto":
+                for m in messages:
+                    if m["role"] == "user":
+                        data["title"] = m["content"][:20]
+                        break
             self._atomic_write(path, json.dumps(data, ensure_ascii=False, indent=2))
             for entry in self.index:
                 if entry["id"] == self.current_id:
@@ -103,6 +142,56 @@ class SessionManager:
                     break
             self._save_index()
 
+    def needs_title(self, sid: str) -> bool:
+        """会话标题是否仍为首条消息截取（尚未由 LLM 生成或用户修改）"""
+        with self._lock:
+            for entry in self.index:
+                if entry["id"] == sid:
+                    return entry.get("title_source", "auto") == "auto"
+        return False
+
+    def untitled_sessions(self) -> list[str]:
+        """所有标题仍为自动截取的会话 ID，按更新时间从新到旧"""
+        with self._lock:
+            return [e["id"] for e in self.list_sessions() if e.get("title_source", "auto") == "auto"]
+
+    def peek_messages(self, sid: str, limit: int = 6) -> list[dict]:
+        """读取会话开头的若干条消息，不切换当前会话"""
+        if not self._validate_session_id(sid):
+            return []
+        with self._lock:
+            path = self.dir / f"{sid}.json"
+            if not path.exists():
+                return []
+            try:
+                data = json.loads(path.read_text("utf-8"))
+            except (OSError, ValueError):
+                log.warning(f"读取会话失败: {sid}", exc_info=True)
+                return []
+            return data.get("messages", [])[:limit]
+
+    def set_generated_title(self, sid: str, title: str) -> bool:
+        """写入 LLM 生成的标题；用户已手动改名时放弃，返回是否写入"""
+        if not self._validate_session_id(sid):
+            return False
+        with self._lock:
+            path = self.dir / f"{sid}.json"
+            if not path.exists():
+                return False
+            data = json.loads(path.read_text("utf-8"))
+            if data.get("title_source", "auto") == "user":
+                return False
+            data["title"] = title
+            data["title_source"] = "llm"
+            self._atomic_write(path, json.dumps(data, ensure_ascii=False, indent=2))
+            for entry in self.index:
+                if entry["id"] == sid:
+                    entry["title"] = title
+                    entry["title_source"] = "llm"
+                    break
+            self._save_index()
+            return True
+
     def rename(self, sid: str, title: str):
         if not self._validate_session_id(sid):
             log.warning(f"非法 session_id: {sid!r}")
@@ -112,10 +201,12 @@ class SessionManager:
             if path.exists():
                 data = json.loads(path.read_text("utf-8"))
                 data["title"] = title
+                data["title_source"] = "user"
                 self._atomic_write(path, json.dumps(data, ensure_ascii=False, indent=2))
             for entry in self.index:
                 if entry["id"] == sid:
                     entry["title"] = title
+                    entry["title_source"] = "user"
                     break
             self._save_index()
 
@@ -0,0 +1,112 @@
+"""会话标题 — 空闲时把多个未命名会话合并到一次 LLM 调用中生成标题"""
+import re
+from src.backend.core.config import get
+from src.backend.core.logger import get_logger
+from src.backend.services.task_queue import PRIORITY_TITLE
+
+log = get_logger("session_titler")
+
+_LINE_RE = re.compile(r"^\s*\[?(\d+)\s*[\]\.、:：)）]\s*(.+?)\s*$")
+_STRIP_CHARS = "\"'“”《》「」【】。.，,"
+_SNIPPET_CHARS = 120
+
+
+class SessionTitler:
+    """收集需要标题的会话，经 BrainService 后台队列批量生成。
+
+    每批最多 session.title_batch_size 个会话，一个 prompt 内按编号逐行输出标题；
+    解析失败的会话保留原标题，不会阻塞回复。
+    """
+
+    def __init__(self, brain_service):
+        self._brain = brain_service
+        self._pending: dict[str, None] = {}  # 保序去重
+
+    def request(self, sid: str | None):
+        """标记会话需要标题，并确保有一个批处理任务在队列中"""
+        if not sid or not get("session.auto_title_generation", True):
+            return
+        if not self._brain.session_mgr.needs_title(sid):
+            return
+        self._pending[sid] = None
+        self._submit()
+
+    def request_all(self):
+        """启动时补齐历史/导入会话的标题"""
+        if not get("session.auto_title_generation", True):
+            return
+        for sid in self._brain.session_mgr.untitled_sessions():
+            self._pending[sid] = None
+        if self._pending:
+            log.info(f"待生成标题的会话: {len(self._pending)} 个")
+            self._submit()
+
+    def _submit(self):
+        # 相同 key 的任务会合并，队列中始终最多一个批处理任务
+        self._brain.tasks.submit("session_titles", self._run, priority=PRIORITY_TITLE, key="session_titles")
+
+    async def _run(self):
+        batch_size = max(1, int(get("session.title_batch_size", 8)))
+        mgr = self._brain.session_mgr
+        while self._pending:
+            engine = self._brain.engine
+            if engine is None:
+                return
+            batch: list[tuple[str, str]] = []
+            for sid in list(self._pending):
+                if len(batch) >= batch_size:
+                    break
+                convo = self._summarize(mgr.peek_messages(sid)) if mgr.needs_title(sid) else ""
+                if convo:
+                    batch.append((sid, convo))
+                else:
+                    self._pending.pop(sid, None)
+            if not batch:
+                return
+            titles = await self._generate(engine, [c for _, c in batch])
+            for idx, (sid, _) in enumerate(batch, 1):
+                # 生成完成后才出队，被抢占时整批仍留在 _pending 中，重跑时继续
+                self._pending.pop(sid, None)
+                title = titles.get(idx)
+                if title and mgr.set_generated_title(sid, title):
+                    await self._brain.socketio.emit(
+                        "session_title", {"id": sid, "title": title}, namespace="/ws/events")
+            log.info(f"会话标题批量生成: {len(batch)} 个，成功 {len(titles)} 个")
+
+    @staticmethod
+    def _summarize(messages: list[dict]) -> str:
+        ai_name = get("ai_name", "AI")
+        lines = []
+        for m in messages:
+            if m.get("role") == "user":
+                lines.append(f"用户: {m['content'][:_SNIPPET_CHARS]}")
+            elif m.get("role") == "assistant":
+                lines.append(f"{ai_name}: {m['content'][:_SNIPPET_CHARS]}")
+        if not any(line.startswith("用户: ") for line in lines):
+            return ""
+        return " / ".join(lines[:4])
+
+    @staticmethod
+    async def _generate(engine, convos: list[str]) -> dict[int, str]:
+        listing = "\n".join(f"{i}. {c}" for i, c in enumerate(convos, 1))
+        prompt = [
+            {"role": "system", "content": (
+                "下面按编号列出若干段对话的开头。请为每段对话生成一个简短标题（不超过12个字），"
+                "每行一个，格式为「编号. 标题」，不要输出其他内容。"
+            )},
+            {"role": "user", "content": listing},
+        ]
+        text = ""
+        async for chunk in engine.generate(prompt):
+            text += chunk
+        text = re.sub(r"\[emotion:\w+\]", "", text)
+        titles: dict[int, str] = {}
+        for line in text.splitlines():
+            m = _LINE_RE.match(line)
+            if not m:
+                continue
+            idx = int(m.group(1))
+            title = m.group(2).strip(_STRIP_CHARS).strip()[:20]
+            if 1 <= idx <= len(convos) and title:
+                titles[idx] = title
+        return titles
@@ -1,11 +1,12 @@
 """全局配置加载"""
 import os
 import threading
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 import yaml
 
-_config: dict | None = None
 _config_path: str = "config.yaml"
 _config_lock = threading.RLock()
 
@@ -14,6 +15,8 @@ _DEFAULTS: dict = {
         "backend_port": 5000,
         "frontend_port": 5173,
         "tts_port": 9880,
+        "sse_flush_interval_ms": 20,
+        "sse_heartbeat_interval": 15,
     },
     "brain": {
         "temperature": 0.7,
@@ -33,6 +36,17 @@ _DEFAULTS: dict = {
         "do_sample": True,
         "stop_sequences": [],
         "num_beams": 1,
+        "quantization": "none",
+        "reload_stop_first": False,
+        "reload_drain_timeout": 60,
+        "llamacpp_threads": 0,
+        "llamacpp_gpu_layers": 0,
+        "llamacpp_use_mmap": True,
+        "llamacpp_cache_mb": 512,
+        "speculative_mode": "none",
+        "speculative_draft_model": "",
+        "speculative_num_tokens": 5,
+        "speculative_ngram_max": 4,
     },
     "behavior": {
         "enabled": False,
@@ -42,6 +56,8 @@ _DEFAULTS: dict = {
         "cron_expression": "",
         "message_templates_enabled": True,
         "llm_generation_enabled": False,
+        "precompute_pool_size": 3,
+        "precompute_max_age_minutes": 180,
         "max_daily_messages": 50,
         "quiet_hours_start": "23:00",
         "quiet_hours_end": "07:00",
@@ -84,6 +100,7 @@ _DEFAULTS: dict = {
         "max_history_messages": 40,
         "auto_save_interval": 30,
         "auto_title_generation": True,
+        "title_batch_size": 8,
         "max_message_length": 10000,
         "export_format": "json",
     },
@@ -110,10 +127,33 @@ _DEFAULTS: dict = {
         "pool_max_size": 20,
         "proxy_enabled": False,
     },
+    "system": {
+        "sample_interval": 2.0,
+        "history_size": 300,
+        "config_watch_interval": 2.0,
+    },
     "diary": {
         "enabled": True,
         "auto_generate": False,
         "generation_time": "23:00",
+        "idle_delay_minutes": 10,
+        "aggregate_max_chars": 1500,
+    },
+    "background": {
+        "max_concurrency": 1,
+        "idle_grace_seconds": 5,
+    },
+    "logging": {
+        "ws_batch_interval_ms": 200,
+        "ws_max_per_second": 200,
+        "rotate_max_mb": 50,
+        "rotate_interval_hours": 24,
+        "backup_count": 10,
+        "retention_days": 14,
+        "stdio_suppress_patterns": [
+            r"%\|", r"it/s", r"s/it", r"ETA",
+            r"\d+%.*[|/\u2588\u258f]", r"[|/\u2588\u258f].*\d+%",
+        ],
     },
 }
 
@@ -129,49 +169,233 @@ def _deep_merge(base: dict, override: dict) -> dict:
     return result
 
 
+class _Snapshot:
+    """一次加载得到的配置快照，发布后不再修改；取值结果按版本缓存"""
+    __slots__ = ("data", "version", "values", "sections")
+
+    def __init__(self, data: dict, version: int):
+        self.data = data
+        self.version = version
+        self.values: dict[str, Any] = {}
+        self.sections: dict = {}
+
+
+_snapshot: _Snapshot | None = None
+_MISSING = object()
+
+
+def _publish(raw: dict) -> dict:
+    """合并默认值并以单次引用赋值发布新快照，读取方无需加锁。调用方需持有 _config_lock"""
+    global _snapshot
+    version = _snapshot.version + 1 if _snapshot else 1
+    _snapshot = _Snapshot(_deep_merge(_DEFAULTS, raw), version)
+    return _snapshot.data
+
+
+class ConfigError(ValueError):
+    """配置文件无法解析或不符合 _DEFAULTS 推导出的类型约束"""
+
+
+def _type_ok(default: Any, value: Any) -> bool:
+    if value is None or default is None:
+        return True
+    if isinstance(default, bool):
+        return isinstance(value, bool)
+    if isinstance(default, (int, float)):
+        # 数值项允许整数与小数互换，如 timeout: 2.5
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if isinstance(default, (list, tuple)):
+        return isinstance(value, list)
+    return isinstance(value, type(default))
+
+
+def validate(raw: Any, schema: dict = _DEFAULTS, prefix: str = "") -> list[str]:
+    """按 _DEFAULTS 中各项默认值的类型校验配置，返回错误描述列表；未登记的键不校验"""
+    if not isinstance(raw, dict):
+        return [f"{prefix or '配置'} 应为映射，实际为 {type(raw).__name__}"]
+    errors = []
+    for k, default in schema.items():
+        if k not in raw:
+            continue
+        full_key = f"{prefix}.{k}" if prefix else k
+        value = raw[k]
+        if isinstance(default, dict):
+            if value is not None:
+                errors.extend(validate(value, default, full_key))
+        elif not _type_ok(default, value):
+            errors.append(f"{full_key} 应为 {type(default).__name__}，实际为 {type(value).__name__}")
+    return errors
+
+
+def _read(path: str, strict: bool = True) -> dict:
+    """读取并校验配置；strict=False 时类型错误只记录日志，仍返回原始内容"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = yaml.safe_load(f)
+    except yaml.YAMLError as e:
+        raise ConfigError(f"YAML 解析失败: {e}") from e
+    raw = raw or {}
+    errors = validate(raw)
+    if errors:
+        if strict:
+            raise ConfigError("; ".join(errors))
+        from src.backend.core.logger import get_logger
+        get_logger("config").warning(f"配置项类型不符，仍按原值加载: {'; '.join(errors)}")
+    return raw
+
+
 def load_config(path: str | Path = "config.yaml") -> dict:
-    global _config, _config_path
+    """首次加载：此时没有可保留的旧快照，类型错误只告警不拒绝；重载（文件监视/API）仍严格校验"""
+    global _config_path
     with _config_lock:
         _config_path = str(path)
-        with open(path, "r", encoding="utf-8") as f:
-            raw = yaml.safe_load(f) or {}
-        _config = _deep_merge(_DEFAULTS, raw)
-        return _config
+        return _publish(_read(_config_path, strict=False))
 
 
 def reload_config() -> dict:
-    global _config
+    """重新读取配置文件；校验失败抛出 ConfigError，当前快照保持不变"""
     with _config_lock:
-        with open(_config_path, "r", encoding="utf-8") as f:
-            raw = yaml.safe_load(f) or {}
-        _config = _deep_merge(_DEFAULTS, raw)
-        return _config
+        return _publish(_read(_config_path))
 
 
-def get_config() -> dict:
+def reload_if_changed() -> tuple[dict, dict]:
+    """重新读取配置文件，返回 (旧配置, 新配置)；合并结果与当前一致时不发布新版本"""
     with _config_lock:
-        if _config is None:
+        old = _current().data
+        merged = _deep_merge(_DEFAULTS, _read(_config_path))
+        if merged == old:
+            return old, old
+        return old, _publish(merged)
+
+
+def write_config(raw: dict, strict: bool = True) -> dict:
+    """校验后写入临时文件再 os.replace 原子替换配置文件，并发布新快照
+
+    strict=False 用于调用方已校验过本次修改的键：文件中其余键的类型错误只记录日志，不拒绝写入。
+    """
+    errors = validate(raw)
+    if errors:
+        if strict:
+            raise ConfigError("; ".join(errors))
+        from src.backend.core.logger import get_logger
+        get_logger("config").warning(f"配置项类型不符，仍按原值写入: {'; '.join(errors)}")
+    with _config_lock:
+        path = Path(_config_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                yaml.dump(raw, f, allow_unicode=True, default_flow_style=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return _publish(raw)
+
+
+def config_path() -> str:
+    return _config_path
+
+
+def _current() -> _Snapshot:
+    snap = _snapshot
+    if snap is not None:
+        return snap
+    with _config_lock:
+        if _snapshot is None:
             root = os.environ.get("YUEXIA_ROOT")
             if root:
-                return load_config(os.path.join(root, "config", "config.yaml"))
-            return load_config()
-        return _config
+                load_config(os.path.join(root, "config", "config.yaml"))
+            else:
+                load_config()
+        return _snapshot
 
 
-_SENTINEL = object()
+def get_config() -> dict:
+    """当前配置字典，视为只读"""
+    return _current().data
+
+
+def config_version() -> int:
+    """配置版本号，每次加载递增"""
+    return _current().version
+
+
+@lru_cache(maxsize=1024)
+def _split_key(key: str) -> tuple[str, ...]:
+    return tuple(key.split("."))
 
 
 def get(key: str, default: Any = None) -> Any:
-    """点分路径取值，如 'brain.engine'"""
-    cfg = get_config()
-    for k in key.split("."):
-        if isinstance(cfg, dict):
-            cfg = cfg.get(k, _SENTINEL)
-            if cfg is _SENTINEL:
-                return default
+    """点分路径取值，如 'brain.engine'；同一版本内的结果缓存在快照上，读取无锁"""
+    snap = _current()
+    value = snap.values.get(key, _MISSING)
+    if value is _MISSING:
+        value = snap.data
+        for k in _split_key(key):
+            if not isinstance(value, dict):
+                value = None
+                break
+            value = value.get(k, _MISSING)
+            if value is _MISSING:
+                value = None
+                break
         else:
-            return default
-    return cfg
+            snap.values[key] = value
+            return value
+        # 不存在的键不缓存，避免不同 default 互相影响
+        return default
+    return value
+
+
+def section(factory: Callable[[], Any]) -> Any:
+    """按配置版本缓存由 factory 构造的配置对象（如 SamplingConfig.from_config）"""
+    snap = _current()
+    obj = snap.sections.get(factory, _MISSING)
+    if obj is _MISSING:
+        obj = factory()
+        snap.sections[factory] = obj
+    return obj
+
+
+@dataclass(frozen=True, slots=True)
+class SamplingConfig:
+    """brain.* 采样参数，引擎每次生成读取一次"""
+    temperature: float
+    max_tokens: int
+    top_p: float
+    top_k: int
+    min_p: float
+    repetition_penalty: float
+    frequency_penalty: float
+    presence_penalty: float
+    do_sample: bool
+    num_beams: int
+    stop_sequences: tuple[str, ...]
+    enable_thinking: bool
+
+    @classmethod
+    def from_config(cls) -> "SamplingConfig":
+        return cls(
+            temperature=get("brain.temperature", 0.7),
+            max_tokens=get("brain.max_tokens", 4096),
+            top_p=get("brain.top_p", 0.9),
+            top_k=get("brain.top_k", 50),
+            min_p=get("brain.min_p", 0.0),
+            repetition_penalty=get("brain.repetition_penalty", 1.0),
+            frequency_penalty=get("brain.frequency_penalty", 0.0),
+            presence_penalty=get("brain.presence_penalty", 0.0),
+            do_sample=get("brain.do_sample", True),
+            num_beams=get("brain.num_beams", 1),
+            stop_sequences=tuple(get("brain.stop_sequences", None) or ()),
+            enable_thinking=get("brain.enable_thinking", False),
+        )
+
+
+def sampling() -> SamplingConfig:
+    return section(SamplingConfig.from_config)
 
 
 def get_root_dir() -> Path:
@@ -0,0 +1,89 @@
+"""配置变更分类 — 对比新旧配置，决定哪些子系统需要重建"""
+
+# 动作类型
+LIVE = "live"              # 每次使用时读取 get()，无需处理
+ENGINE = "engine"          # 重建 LLM 引擎（蓝绿重载）
+TTS = "tts"                # 重建 TTS 客户端
+MEMORY = "memory"          # 重新打开记忆库
+PROMPT = "prompt"          # 重新加载系统提示词
+DIARY = "diary"            # 重建日记写入器与调度
+BEHAVIOR = "behavior"      # 重启行为引擎
+BACKGROUND = "background"  # 调整后台任务队列参数
+RESTART = "restart"        # 需重启进程才能生效
+
+# 按顺序匹配，精确键或以 "." 结尾的前缀；先写具体规则再写兜底前缀
+_RULES: tuple[tuple[str, str], ...] = (
+    # 采样参数在每次 generate 时读取
+    ("brain.temperature", LIVE),
+    ("brain.max_tokens", LIVE),
+    ("brain.top_p", LIVE),
+    ("brain.top_k", LIVE),
+    ("brain.min_p", LIVE),
+    ("brain.repetition_penalty", LIVE),
+    ("brain.frequency_penalty", LIVE),
+    ("brain.presence_penalty", LIVE),
+    ("brain.do_sample", LIVE),
+    ("brain.num_beams", LIVE),
+    ("brain.stop_sequences", LIVE),
+    ("brain.enable_thinking", LIVE),
+    ("brain.stream", LIVE),
+    ("brain.max_history_messages", LIVE),
+    ("brain.reload_stop_first", LIVE),
+    ("brain.reload_drain_timeout", LIVE),
+    ("brain.system_prompt_path", PROMPT),
+    ("ai_name", PROMPT),
+    ("brain.", ENGINE),
+    # API 引擎在初始化时创建连接池
+    ("network.", ENGINE),
+    ("perception.tts.speed", LIVE),
+    ("perception.tts.", TTS),
+    ("perception.asr.", LIVE),
+    ("memory.", MEMORY),
+    ("diary.", DIARY),
+    ("behavior.", BEHAVIOR),
+    ("background.", BACKGROUND),
+    ("session.dir", RESTART),
+    ("server.", RESTART),
+    ("system.", RESTART),
+    ("general.", LIVE),
+    ("session.", LIVE),
+    # CORS 与访问控制中间件只在 create_app() 中注册一次
+    ("security.", RESTART),
+    ("action.", LIVE),
+    # Live2D 窗口参数由前端/窗口进程读取
+    ("face.", LIVE),
+    ("logging.", LIVE),
+)
+
+
+def flatten(d: dict, prefix: str = "") -> dict:
+    """将嵌套 dict 展平为 {点分路径: 值}"""
+    items = {}
+    for k, v in d.items():
+        full_key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            items.update(flatten(v, full_key))
+        else:
+            items[full_key] = v
+    return items
+
+
+def changed_keys(old: dict, new: dict) -> set[str]:
+    old_items, new_items = flatten(old), flatten(new)
+    return {k for k in old_items.keys() | new_items.keys() if old_items.get(k) != new_items.get(k)}
+
+
+def classify_key(key: str) -> str:
+    for rule, action in _RULES:
+        if key == rule or (rule.endswith(".") and key.startswith(rule)):
+            return action
+    # 未登记的键不猜测其影响范围，提示重启后生效
+    return RESTART
+
+
+def classify(keys: set[str]) -> dict[str, list[str]]:
+    """按动作分组变更的键；包含 ENGINE 时其余非 LIVE 动作仍需各自执行"""
+    actions: dict[str, list[str]] = {}
+    for key in sorted(keys):
+        actions.setdefault(classify_key(key), []).append(key)
+    return actions
@@ -0,0 +1,81 @@
+"""配置文件监视 — 轮询 config.yaml 的修改时间，外部编辑后校验、原子发布并定向重载"""
+import os
+import threading
+from typing import Callable
+
+from src.backend.core import config_diff
+from src.backend.core.config import ConfigError, config_path, reload_if_changed
+from src.backend.core.logger import get_logger
+
+log = get_logger("config_watcher")
+
+
+def _signature(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ConfigWatcher:
+    """后台线程按 interval 秒检查配置文件。
+
+    文件签名（mtime, size）变化后需在下一次轮询时保持不变才读取，避免读到编辑器写了一半的文件；
+    校验失败时保留当前快照。API 写入会先发布同样内容的快照，此处比对无差异即跳过，不会重复重载。
+    """
+
+    def __init__(self, on_change: Callable[[set[str]], object], interval: float = 2.0):
+        self.on_change = on_change
+        self.interval = max(0.2, float(interval))
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._seen = _signature(config_path())
+        self._pending = None
+        self._failed = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+        log.info(f"配置文件监视已启动: {config_path()}（间隔 {self.interval}s）")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                log.exception("配置文件检查失败")
+
+    def poll(self) -> set[str] | None:
+        """检查一次文件，发生有效变更时返回变更的键"""
+        sig = _signature(config_path())
+        if sig is None or sig == self._seen:
+            self._pending = None
+            return None
+        if sig != self._pending:
+            # 首次看到新签名，等下一轮确认写入已结束
+            self._pending = sig
+            return None
+        self._seen, self._pending = sig, None
+        try:
+            old, new = reload_if_changed()
+        except (ConfigError, OSError) as e:
+            if sig != self._failed:
+                log.error(f"配置文件无效，保留当前配置: {e}")
+                self._failed = sig
+            return None
+        self._failed = None
+        if new is old:
+            return None
+        changed = config_diff.changed_keys(old, new)
+        log.info(f"检测到配置文件修改: {sorted(changed)}")
+        self.on_change(changed)
+        return changed
@@ -0,0 +1,170 @@
+"""structured.jsonl 的稀疏时间索引 — 旁路文件记录 (ts, 字节偏移)，按时间查询时二分定位后顺序读取
+
+索引点约每 _STRIDE 字节一个，第 0 个固定为文件开头；切分截断后首行时间戳变化，索引随之重建。
+"""
+import array
+import bisect
+import os
+import re
+import struct
+import threading
+from pathlib import Path
+
+from src.backend.core.log_query import EntryFilter
+
+_STRIDE = 64 * 1024
+_POINT = struct.Struct("<dQ")
+_TS_RE = re.compile(rb'^\{"ts": ([0-9.]+)')
+# 跨线程写入的记录时间戳可能略有乱序，定位起点与判断结束时留出余量
+_SKEW = 5.0
+
+
+def _line_ts(line: bytes) -> float | None:
+    m = _TS_RE.match(line)
+    return float(m.group(1)) if m else None
+
+
+class LogIndex:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self._ts = array.array("d")
+        self._offsets = array.array("Q")
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            data = self.index_path.read_bytes()
+        except OSError:
+            return
+        usable = len(data) - len(data) % _POINT.size
+        for ts, offset in _POINT.iter_unpack(data[:usable]):
+            self._ts.append(ts)
+            self._offsets.append(offset)
+
+    def _reset(self):
+        self._ts = array.array("d")
+        self._offsets = array.array("Q")
+        try:
+            self.index_path.unlink()
+        except OSError:
+            pass
+
+    def _valid(self, f) -> bool:
+        """首行时间戳与索引第 0 点一致，且文件未短于最后一个索引点"""
+        if not self._offsets:
+            return True
+        f.seek(0)
+        first = _line_ts(f.readline()) or 0.0
+        size = os.fstat(f.fileno()).st_size
+        return first == self._ts[0] and size >= self._offsets[-1]
+
+    def refresh(self, f):
+        """从最后一个索引点继续扫描到文件末尾，追加新的索引点"""
+        with self._lock:
+            if not self._valid(f):
+                self._reset()
+            start = self._offsets[-1] if self._offsets else 0
+            last = start
+            new_points = []
+            if not self._offsets:
+                f.seek(0)
+                new_points.append((_line_ts(f.readline()) or 0.0, 0))
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if offset - last >= _STRIDE:
+                    ts = _line_ts(line)
+                    if ts is not None:
+                        new_points.append((ts, offset))
+                        last = offset
+                offset += len(line)
+            if not new_points:
+                return
+            with open(self.index_path, "ab") as out:
+                for ts, off in new_points:
+                    out.write(_POINT.pack(ts, off))
+                    self._ts.append(ts)
+                    self._offsets.append(off)
+
+    def seek_offset(self, since: float | None) -> int:
+        """不晚于 since 的最近索引点偏移，从这里顺序读不会漏掉 since 之后的记录"""
+        if since is None or not self._ts:
+            return 0
+        i = bisect.bisect_right(self._ts, since - _SKEW) - 1
+        return self._offsets[i] if i >= 0 else 0
+
+    def generation(self) -> int:
+        """当前文件内容的标识（首行时间戳的毫秒数），用于判断游标是否跨越了切分"""
+        return int(self._ts[0] * 1000) if self._ts else 0
+
+
+_indexes: dict[Path, LogIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path: str | Path) -> LogIndex:
+    path = Path(path)
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = LogIndex(path)
+        return index
+
+
+class CursorExpired(ValueError):
+    """游标所指的文件内容已被切分替换"""
+
+
+def encode_cursor(generation: int, offset: int) -> str:
+    return f"{generation:x}.{offset:x}"
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        gen, offset = cursor.split(".", 1)
+        return int(gen, 16), int(offset, 16)
+    except ValueError:
+        raise ValueError(f"无效的游标: {cursor!r}") from None
+
+
+def query_page(path: str | Path, entry_filter: EntryFilter, cursor: str | None = None,
+               limit: int = 100, max_scan_bytes: int = 8 * 1024 * 1024) -> tuple[list[dict], str | None]:
+    """按时间顺序返回至多 limit 条匹配记录与下一页游标；读到末尾或超过 until 时游标为 None。
+
+    单次最多扫描 max_scan_bytes 字节，未满一页也返回游标，避免关键字检索长时间占用线程。
+    """
+    index = get_index(path)
+    items: list[dict] = []
+    with open(index.path, "rb") as f:
+        index.refresh(f)
+        generation = index.generation()
+        if cursor:
+            cursor_gen, offset = decode_cursor(cursor)
+            if cursor_gen != generation:
+                raise CursorExpired("日志文件已切分，游标失效")
+        else:
+            offset = index.seek_offset(entry_filter.since)
+        f.seek(offset)
+        scanned = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                # 写线程尚未写完的行留给下一页
+                return items, encode_cursor(generation, offset)
+            offset += len(line)
+            scanned += len(line)
+            if entry_filter.until is not None:
+                ts = _line_ts(line)
+                if ts is not None and ts > entry_filter.until + _SKEW:
+                    return items, None
+            entry = entry_filter.match_line(line.decode("utf-8", errors="replace"))
+            if entry is not None:
+                items.append(entry)
+                if len(items) >= limit:
+                    return items, encode_cursor(generation, offset)
+            if scanned >= max_scan_bytes:
+                return items, encode_cursor(generation, offset)
+    return items, None
@@ -0,0 +1,170 @@
+"""结构化日志查询 — 流式过滤 structured.jsonl 及其 .gz 归档分段
+
+命令行用法：
+    python -m src.backend.core.log_query [日志目录或文件] --level WARNING --module brain --since 2h -q 超时
+"""
+import argparse
+import gzip
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from src.backend.core.log_rotation import rotated_segments
+from src.backend.core.logger import latest_log_dir
+
+STRUCTURED_LOG = "structured.jsonl"
+_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+_RELATIVE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_time(value) -> float | None:
+    """时间参数 -> epoch 秒；支持 epoch 数字、ISO 时间（2026-10-19T10:00）和相对时长（30m / 2h / 1d）"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    unit = _RELATIVE_UNITS.get(text[-1:].lower())
+    if unit and text[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(text[:-1]) * unit
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise ValueError(f"无法解析时间: {value!r}") from None
+
+
+def log_files(target: str | Path | None = None) -> list[Path]:
+    """目标目录下的归档分段（从旧到新）加当前文件；传入文件则只查该文件"""
+    path = Path(target) if target else latest_log_dir()
+    if path is None:
+        return []
+    if path.is_file():
+        return [path]
+    active = path / STRUCTURED_LOG
+    files = rotated_segments(active)
+    if active.is_file():
+        files.append(active)
+    return files
+
+
+def open_log(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def levels_at_least(level: str | None) -> tuple[str, ...] | None:
+    if not level:
+        return None
+    min_no = logging.getLevelName(level.upper())
+    if not isinstance(min_no, int):
+        raise ValueError(f"未知日志级别: {level!r}")
+    return tuple(name for name in _LEVELS if logging.getLevelName(name) >= min_no)
+
+
+class EntryFilter:
+    """按级别（不低于）、模块（含子模块）、时间范围和关键字过滤；先做原始行子串预筛，再解析 JSON"""
+
+    def __init__(self, level: str | None = None, module: str | None = None,
+                 since=None, until=None, q: str | None = None):
+        levels = levels_at_least(level)
+        self._level_tokens = tuple(f'"level": "{name}"' for name in levels) if levels else None
+        self.levels = frozenset(levels) if levels else None
+        self.module = module or None
+        self.since = parse_time(since)
+        self.until = parse_time(until)
+        self.q = q.lower() if q else None
+        # 原始行中引号、反斜杠、换行等已被 JSON 转义，预筛需用转义后的形式
+        self._q_raw = json.dumps(self.q, ensure_ascii=False)[1:-1] if self.q else None
+
+    def match_line(self, line: str) -> dict | None:
+        if self._level_tokens and not any(t in line for t in self._level_tokens):
+            return None
+        if self.module and self.module not in line:
+            return None
+        if self._q_raw and self._q_raw not in line.lower():
+            return None
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        return entry if self.match(entry) else None
+
+    def match(self, entry: dict) -> bool:
+        if self.levels and entry.get("level") not in self.levels:
+            return False
+        if self.module:
+            module = entry.get("module") or ""
+            if module != self.module and not module.startswith(self.module + "."):
+                return False
+        if self.since is not None or self.until is not None:
+            ts = entry.get("ts")
+            if ts is None:
+                return False
+            if self.since is not None and ts < self.since:
+                return False
+            if self.until is not None and ts > self.until:
+                return False
+        if self.q:
+            text = f"{entry.get('message') or ''}\n{entry.get('exc_info') or ''}".lower()
+            if self.q not in text:
+                return False
+        return True
+
+
+def iter_entries(files: Iterable[Path], entry_filter: EntryFilter) -> Iterator[dict]:
+    for path in files:
+        try:
+            with open_log(path) as f:
+                for line in f:
+                    entry = entry_filter.match_line(line)
+                    if entry is not None:
+                        yield entry
+        except (OSError, EOFError) as e:
+            print(f"[log_query] 读取 {path} 失败: {e}", file=sys.stderr)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="过滤 structured.jsonl（含 .gz 归档）")
+    parser.add_argument("path", nargs="?", help="日志目录或文件，默认 logs/ 下最新目录")
+    parser.add_argument("--level", help="最低级别，如 WARNING")
+    parser.add_argument("--module", help="模块名，包含其子模块")
+    parser.add_argument("--since", help="起始时间：epoch / ISO / 相对时长如 2h")
+    parser.add_argument("--until", help="结束时间，格式同 --since")
+    parser.add_argument("-q", "--query", help="消息或异常中包含的关键字（不区分大小写）")
+    parser.add_argument("-n", "--limit", type=int, default=0, help="最多输出条数，0 表示不限")
+    parser.add_argument("--json", action="store_true", help="输出原始 JSON 行")
+    args = parser.parse_args(argv)
+
+    try:
+        entry_filter = EntryFilter(args.level, args.module, args.since, args.until, args.query)
+    except ValueError as e:
+        parser.error(str(e))
+    files = log_files(args.path)
+    if not files:
+        print("未找到 structured.jsonl", file=sys.stderr)
+        return 1
+    count = 0
+    for entry in iter_entries(files, entry_filter):
+        if args.json:
+            print(json.dumps(entry, ensure_ascii=False))
+        else:
+            print(f"[{entry.get('time')}][{entry.get('module')}][{entry.get('level')}] {entry.get('message')}")
+            if entry.get("exc_info"):
+                print(entry["exc_info"])
+        count += 1
+        if args.limit and count >= args.limit:
+            break
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""日志切分 — 按大小/时间切分、gzip 压缩与保留策略
+
+采用复制后原地截断（copytruncate）：backend.log 同时被 launcher 重定向的 stdout 以追加方式写入，
+改名切分会让对方继续写进已归档的旧文件。
+"""
+import gzip
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from src.backend.core.logger import _original_stderr
+
+_STAMP_FMT = "%Y%m%d-%H%M%S"
+
+
+def _settings() -> tuple[float, float, int, float]:
+    """(单文件上限字节, 切分间隔秒, 保留份数, 保留天数)；配置尚未加载时使用默认值"""
+    try:
+        from src.backend.core.config import get
+        return (
+            get("logging.rotate_max_mb", 50) * 1024 * 1024,
+            get("logging.rotate_interval_hours", 24) * 3600,
+            get("logging.backup_count", 10),
+            get("logging.retention_days", 14),
+        )
+    except Exception:
+        return 50 * 1024 * 1024, 24 * 3600, 10, 14
+
+
+def rotated_segments(path: str | Path) -> list[Path]:
+    """path 已归档的压缩分段，按时间从旧到新排序，如 structured.20261019-130405.jsonl.gz"""
+    path = Path(path)
+    return sorted(path.parent.glob(f"{path.stem}.*{path.suffix}.gz"))
+
+
+class LogRotator:
+    """由写线程在每批日志 flush 后调用 maybe_rotate；压缩与清理在后台线程进行"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._opened_at = time.time()
+
+    def maybe_rotate(self, stream) -> bool:
+        max_bytes, interval, _, _ = _settings()
+        try:
+            size = os.fstat(stream.fileno()).st_size
+        except (OSError, ValueError):
+            return False
+        if size == 0:
+            return False
+        due = (max_bytes > 0 and size >= max_bytes) or \
+              (interval > 0 and time.time() - self._opened_at >= interval)
+        if not due:
+            return False
+        self.rotate(stream)
+        return True
+
+    def rotate(self, stream):
+        stream.flush()
+        tmp, dest = self._targets()
+        try:
+            shutil.copyfile(self.path, tmp)
+            os.ftruncate(stream.fileno(), 0)
+            stream.seek(0)
+        except OSError as e:
+            print(f"[LogRotator] 切分 {self.path.name} 失败: {e}", file=_original_stderr)
+            tmp.unlink(missing_ok=True)
+            return
+        self._opened_at = time.time()
+        threading.Thread(target=self._compress, args=(tmp, dest),
+                         name="log-compress", daemon=True).start()
+
+    def _targets(self) -> tuple[Path, Path]:
+        """(未压缩临时文件, 归档文件)；同一秒内多次切分时追加序号避免覆盖"""
+        stamp = time.strftime(_STAMP_FMT)
+        for n in range(100):
+            tag = f"{stamp}_{n:02d}" if n else stamp
+            tmp = self.path.with_name(f".{self.path.stem}.{tag}{self.path.suffix}.tmp")
+            dest = self.path.with_name(f"{self.path.stem}.{tag}{self.path.suffix}.gz")
+            if not tmp.exists() and not dest.exists():
+                break
+        return tmp, dest
+
+    def _compress(self, src: Path, dest: Path):
+        part = dest.with_name(dest.name + ".part")
+        try:
+            with open(src, "rb") as fin, gzip.open(part, "wb", compresslevel=6) as fout:
+                shutil.copyfileobj(fin, fout, 1024 * 1024)
+            os.replace(part, dest)
+            src.unlink()
+        except OSError as e:
+            print(f"[LogRotator] 压缩 {src.name} 失败: {e}", file=_original_stderr)
+            part.unlink(missing_ok=True)
+            return
+        self.prune()
+
+    def prune(self):
+        """超出保留份数或保留天数的归档分段被删除"""
+        _, _, backup_count, retention_days = _settings()
+        segments = rotated_segments(self.path)
+        expired = segments[:-backup_count] if backup_count > 0 else []
+        if retention_days > 0:
+            cutoff = time.time() - retention_days * 86400
+            for seg in segments[len(expired):]:
+                try:
+                    if seg.stat().st_mtime < cutoff:
+                        expired.append(seg)
+                except OSError:
+                    pass
+        for seg in expired:
+            try:
+                seg.unlink()
+            except OSError:
+                pass
@@ -1,7 +1,10 @@
 """统一日志（精简版，仅保留 backend 所需）"""
+import atexit
 import io
 import os
 import logging
+import logging.handlers
+import queue
 import re
 import sys
 import threading
@@ -13,67 +16,169 @@ _DATE_FMT = "%H:%M:%S"
 _original_stdout = sys.stdout
 _original_stderr = sys.stderr
 _root_configured = False
+_listener: "_BatchingQueueListener | None" = None
+# 写线程标记：处理器出错时 logging.Handler.handleError 会写 sys.stderr，
+# 若再经 StreamToLogger 入队会形成自我循环，写线程上的 stdio 输出直接写原始流
+_writer_local = threading.local()
 
 
-def _find_log_dir():
-    """查找 logs 目录下最新的子目录，优先使用 YUEXIA_ROOT 绝对路径"""
-    from datetime import datetime
+def _logs_root() -> Path:
+    """logs 根目录，优先使用 YUEXIA_ROOT 绝对路径"""
     env_root = os.environ.get("YUEXIA_ROOT", "").strip()
     if env_root:
-        logs_root = Path(env_root) / "logs"
-    else:
-        # 通过当前文件路径推算项目根目录: src/backend/core/logger.py -> 往上4级
-        project_root = Path(__file__).resolve().parent.parent.parent.parent
-        logs_root = project_root / "logs"
+        return Path(env_root) / "logs"
+    # 通过当前文件路径推算项目根目录: src/backend/core/logger.py -> 往上4级
+    return Path(__file__).resolve().parent.parent.parent.parent / "logs"
+
+
+def latest_log_dir() -> Path | None:
+    """logs 目录下最新的子目录（按名称即日期排序），不存在时返回 None，不创建"""
+    logs_root = _logs_root()
     if not logs_root.is_dir():
-        try:
-            today = datetime.now().strftime("%Y%m%d")
-            log_dir = logs_root / today
-            log_dir.mkdir(parents=True, exist_ok=True)
-            return str(log_dir)
-        except OSError:
-            return None
-    subdirs = sorted([d for d in logs_root.iterdir() if d.is_dir()])
-    if not subdirs:
-        try:
-            today = datetime.now().strftime("%Y%m%d")
-            log_dir = logs_root / today
-            log_dir.mkdir(exist_ok=True)
-            return str(log_dir)
-        except OSError:
-            return None
-    return str(subdirs[-1])
+        return None
+    subdirs = sorted(d for d in logs_root.iterdir() if d.is_dir())
+    return subdirs[-1] if subdirs else None
+
+
+def _find_log_dir():
+    """查找 logs 目录下最新的子目录，没有时按当天日期创建"""
+    from datetime import datetime
+    log_dir = latest_log_dir()
+    if log_dir is not None:
+        return str(log_dir)
+    try:
+        log_dir = _logs_root() / datetime.now().strftime("%Y%m%d")
+        log_dir.mkdir(parents=True, exist_ok=True)
+        return str(log_dir)
+    except OSError:
+        return None
+
+
+class _BatchStreamHandler(logging.StreamHandler):
+    """emit 只写入流缓冲，由写线程在一批记录处理完后统一 flush"""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class _BatchFileHandler(logging.FileHandler):
+    """批量 flush 的文件处理器，每批写完后检查是否需要切分"""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, **kwargs)
+        from src.backend.core.log_rotation import LogRotator
+        self.rotator = LogRotator(filename)
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+        if self.stream is not None:
+            self.rotator.maybe_rotate(self.stream)
+
+
+class _PreparingQueueHandler(logging.handlers.QueueHandler):
+    """入队前只固化消息文本与异常堆栈，保留 levelname/name/lineno 等字段供结构化处理器使用"""
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """单个写线程分发记录；队列排空或累计 _FLUSH_EVERY 条后才 flush 各处理器"""
+    _FLUSH_EVERY = 256
+
+    def __init__(self, q):
+        super().__init__(q, respect_handler_level=True)
+        self._unflushed = 0
+
+    def add_handler(self, handler: logging.Handler):
+        # 元组整体替换，写线程读取到的总是完整的处理器列表
+        self.handlers = self.handlers + (handler,)
+
+    def handle(self, record):
+        _writer_local.active = True
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                try:
+                    handler.handle(record)
+                except Exception as e:
+                    print(f"[LogWriter] {type(handler).__name__}: {e}", file=_original_stderr)
+        self._unflushed += 1
+        if self._unflushed >= self._FLUSH_EVERY or self.queue.empty():
+            self.flush()
+
+    def flush(self):
+        self._unflushed = 0
+        for handler in self.handlers:
+            flush_batch = getattr(handler, "flush_batch", None)
+            if flush_batch is not None:
+                try:
+                    flush_batch()
+                except Exception as e:
+                    print(f"[LogWriter] {e}", file=_original_stderr)
 
 
 def _setup_root_logger():
-    global _root_configured
+    global _root_configured, _listener
     if _root_configured:
         return
     root = logging.getLogger()
     fmt = logging.Formatter(_LOG_FMT, datefmt=_DATE_FMT)
 
-    stream = io.TextIOWrapper(_original_stdout.buffer, encoding='utf-8', errors='replace', line_buffering=True)
-    handler = logging.StreamHandler(stream)
+    # 所有处理器都挂在写线程上，调用方（包括事件循环）只做一次入队
+    q = queue.SimpleQueue()
+    _listener = _BatchingQueueListener(q)
+
+    stream = io.TextIOWrapper(_original_stdout.buffer, encoding='utf-8', errors='replace')
+    handler = _BatchStreamHandler(stream)
     handler.setFormatter(fmt)
-    root.addHandler(handler)
+    _listener.add_handler(handler)
 
     # 直接写入 backend.log，绕过 conda run 的管道缓冲
     log_dir = _find_log_dir()
     if log_dir:
         try:
-            fh = logging.FileHandler(
+            fh = _BatchFileHandler(
                 Path(log_dir) / "backend.log", encoding="utf-8"
             )
             fh.setLevel(logging.INFO)
             fh.setFormatter(fmt)
-            root.addHandler(fh)
+            _listener.add_handler(fh)
         except OSError:
             pass
 
+    root.addHandler(_PreparingQueueHandler(q))
     root.setLevel(logging.INFO)
+    _listener.start()
+    atexit.register(_stop_listener)
     _root_configured = True
 
 
+def _stop_listener():
+    """进程退出时排空队列并 flush"""
+    _listener.stop()
+    _listener.flush()
+
+
+def add_handler(handler: logging.Handler):
+    """在写线程上挂载处理器；不要直接 addHandler 到 root，否则会在调用线程同步执行"""
+    _setup_root_logger()
+    _listener.add_handler(handler)
+
+
 def get_logger(name: str, level: int = None) -> logging.Logger:
     _setup_root_logger()
     logger = logging.getLogger(name)
@@ -88,7 +193,38 @@ class WerkzeugFilter(logging.Filter):
         return not (record.name == 'werkzeug' and self._http_re.match(record.getMessage()))
 
 
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]')
+# stderr 中的弃用/兼容性警告降级为 WARNING
+_WARN_RE = re.compile(r'DeprecationWarning|FutureWarning|UserWarning|deprecated|will be removed')
+_MAX_PARTIAL = 8192
+
+
+def _compile_suppress():
+    """logging.stdio_suppress_patterns 合并为一个正则，无效的模式跳过"""
+    from src.backend.core.config import get
+    valid = []
+    for pattern in get("logging.stdio_suppress_patterns", None) or ():
+        try:
+            re.compile(pattern)
+        except (re.error, TypeError) as e:
+            print(f"[StreamToLogger] 忽略无效的过滤模式 {pattern!r}: {e}", file=_original_stderr)
+            continue
+        valid.append(f"(?:{pattern})")
+    return re.compile("|".join(valid)) if valid else None
+
+
+def _suppress_re():
+    """按配置版本缓存的进度条过滤正则"""
+    try:
+        from src.backend.core.config import section
+        return section(_compile_suppress)
+    except Exception:
+        return None
+
+
 class StreamToLogger:
+    """替换 sys.stdout/stderr：按行写入 logger，未以换行结尾的内容缓冲到下一次写入（各线程独立）"""
+
     def __init__(self, logger: logging.Logger, level: int, original_stream):
         self.logger = logger
         self.level = level
@@ -96,35 +232,51 @@ class StreamToLogger:
         self._local = threading.local()
 
     def write(self, msg):
-        if msg and msg.strip():
-            if not getattr(self._local, 'redirecting', False):
-                self._local.redirecting = True
-                try:
-                    msg = msg.rstrip()
-                    if not msg:
-                        return
-                    msg = re.sub(r'\x1b\[[0-9;]*[a-zA-Z]', '', msg)
-
-                    level = self.level
-
-                    # 进度条检测：直接跳过，不记录
-                    if '\r' in msg or '%|' in msg or 'it/s' in msg or 'ETA' in msg:
-                        return
-                    if re.search(r'\d+%', msg) and ('|' in msg or '\u2588' in msg or '\u258f' in msg or '/' in msg):
-                        return
-
-                    # stderr 弃用警告降级为 WARNING
-                    if level >= logging.ERROR:
-                        _warn_kw = ('DeprecationWarning', 'FutureWarning', 'UserWarning',
-                                    'deprecated', 'will be removed', 'is deprecated')
-                        if any(kw in msg for kw in _warn_kw):
-                            level = logging.WARNING
-
-                    self.logger.log(level, msg)
-                finally:
-                    self._local.redirecting = False
+        if not msg:
+            return
+        local = self._local
+        if getattr(local, 'redirecting', False) or getattr(_writer_local, 'active', False):
+            self.original_stream.write(msg)
+            return
+        partial = getattr(local, 'partial', '')
+        # 快速路径：无缓冲时整行写入或空白写入，无需拼接和切分
+        if not partial:
+            if msg.isspace():
                 return
-        self.original_stream.write(msg)
+            if msg[-1] == '\n' and msg.find('\n') == len(msg) - 1:
+                self._emit(msg)
+                return
+        text = partial + msg if partial else msg
+        *lines, rest = text.split('\n')
+        if '\r' in rest:
+            # 回车重绘（进度条）只保留最后一段
+            rest = rest.rsplit('\r', 1)[-1]
+        if len(rest) > _MAX_PARTIAL:
+            lines.append(rest)
+            rest = ''
+        local.partial = rest
+        for line in lines:
+            self._emit(line)
+
+    def _emit(self, line: str):
+        line = line.rstrip()
+        if '\r' in line:
+            line = line.rsplit('\r', 1)[-1]
+        if not line:
+            return
+        if '\x1b' in line:
+            line = _ANSI_RE.sub('', line)
+        suppress = _suppress_re()
+        if suppress is not None and suppress.search(line):
+            return
+        level = self.level
+        if level >= logging.ERROR and _WARN_RE.search(line):
+            level = logging.WARNING
+        self._local.redirecting = True
+        try:
+            self.logger.log(level, line)
+        finally:
+            self._local.redirecting = False
 
     def flush(self):
         self.original_stream.flush()
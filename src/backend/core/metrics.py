@@ -0,0 +1,71 @@
+"""Prometheus 指标定义 — 未安装 prometheus_client 时退化为空操作"""
+try:
+    from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+except ImportError:
+    Counter = Gauge = Histogram = None
+    generate_latest = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _NoopMetric:
+    """prometheus_client 缺失时的占位指标，所有操作均忽略"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return _NoopTimer()
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _make(cls, name: str, doc: str, labels: tuple = (), **kwargs):
+    if cls is None:
+        return _NoopMetric()
+    return cls(name, doc, labels, **kwargs)
+
+
+# 生成耗时可达数十秒，桶需覆盖长尾
+_GEN_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300)
+_IO_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+CHAT_REQUESTS = _make(Counter, "yuexia_chat_requests_total", "聊天请求数", ("status",))
+GENERATION_SECONDS = _make(Histogram, "yuexia_generation_seconds", "单次生成总耗时", buckets=_GEN_BUCKETS)
+FIRST_TOKEN_SECONDS = _make(Histogram, "yuexia_generation_first_token_seconds", "首个 token 延迟", buckets=_GEN_BUCKETS)
+GENERATION_CHUNKS = _make(Counter, "yuexia_generation_chunks_total", "生成的流式片段数")
+TTS_QUEUE_DEPTH = _make(Gauge, "yuexia_tts_queue_depth", "进行中的 TTS 合成任务数")
+TTS_SECONDS = _make(Histogram, "yuexia_tts_seconds", "TTS 合成耗时", ("status",), buckets=_GEN_BUCKETS)
+SESSION_SAVE_SECONDS = _make(Histogram, "yuexia_session_save_seconds", "会话持久化耗时", buckets=_IO_BUCKETS)
+MEMORY_QUERY_SECONDS = _make(Histogram, "yuexia_memory_query_seconds", "记忆检索耗时", buckets=_IO_BUCKETS)
+SOCKETIO_CLIENTS = _make(Gauge, "yuexia_socketio_connected_clients", "Socket.IO 当前连接数", ("namespace",))
+SOCKETIO_EVENTS = _make(Counter, "yuexia_socketio_emitted_events_total", "Socket.IO 发送事件数", ("event",))
+ENGINE_RELOADS = _make(Counter, "yuexia_engine_reloads_total", "LLM 引擎重载次数", ("status",))
+
+
+def is_available() -> bool:
+    return generate_latest is not None
+
+
+def render() -> bytes:
+    """导出 Prometheus 文本格式"""
+    if generate_latest is None:
+        return b""
+    return generate_latest()
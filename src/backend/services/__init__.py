@@ -1,12 +1,14 @@
 """后端服务初始化 — 后台线程加载 + 状态追踪"""
 import sys
 from src.backend.core.logger import get_logger
+from src.backend.core.metrics import ENGINE_RELOADS
 
 log = get_logger("services")
 
 _brain_service = None
 _log_service = None
 _perception_service = None
+_config_watcher = None
 
 _ready = False
 _loading_status: dict = {
@@ -34,6 +36,13 @@ def boot_services(socketio):
         _loading_status["log"] = f"error: {e}"
         log.exception("LogService 初始化失败")
 
+    # 系统采样首次调用 GPUtil 会启动 nvidia-smi 子进程，在启动线程中提前开始，不留给第一个 API 请求
+    try:
+        from src.backend.services.system_sampler import get_sampler
+        get_sampler()
+    except Exception:
+        log.exception("系统采样启动失败")
+
     # 2. PerceptionService
     _loading_status["perception"] = "loading"
     try:
@@ -77,6 +86,7 @@ def boot_services(socketio):
 
     _ready = True
     log.info(f"所有服务加载完成: {_loading_status}")
+    _start_config_watcher()
     import asyncio
     try:
         loop = asyncio.get_event_loop()
@@ -91,6 +101,21 @@ def boot_services(socketio):
         log.warning("发送 services_ready 事件失败", exc_info=True)
 
 
+def _start_config_watcher():
+    """监视配置文件的外部修改，变更经 apply_config_changes 定向重载"""
+    global _config_watcher
+    from src.backend.core.config import get
+    interval = get("system.config_watch_interval", 2.0)
+    if not interval or interval <= 0:
+        return
+    try:
+        from src.backend.core.config_watcher import ConfigWatcher
+        _config_watcher = ConfigWatcher(apply_config_changes, interval)
+        _config_watcher.start()
+    except Exception:
+        log.exception("配置文件监视启动失败")
+
+
 def is_ready():
     return _ready
 
@@ -112,30 +137,51 @@ def get_perception():
 
 
 def reload_services():
-    """配置变更后重载 BrainService（重建 LLM 引擎）"""
-    global _brain_service
+    """配置变更后在后台蓝绿重载 LLM 引擎，立即返回；进度通过 engine_reload 事件推送"""
     if not _brain_service:
         return
-    with _brain_service._engine_lock:
-        try:
-            _loading_status["engine"] = "reloading"
-            if _brain_service.engine:
-                import asyncio
-                try:
-                    asyncio.run_coroutine_threadsafe(
-                        _brain_service.engine.shutdown(), _brain_service._loop
-                    ).result(timeout=10)
-                except Exception:
-                    log.warning("旧引擎关闭超时或失败", exc_info=True)
-                    try:
-                        import torch
-                        torch.cuda.empty_cache()
-                    except Exception:
-                        pass
-            _brain_service.engine = None
-            _brain_service._do_load_engine()
+    _loading_status["engine"] = "reloading"
+
+    def _done(ok: bool):
+        if ok:
             _loading_status["engine"] = "ok"
+            ENGINE_RELOADS.labels("ok").inc()
             log.info("LLM 引擎重载完成")
-        except Exception as e:
-            _loading_status["engine"] = f"error: {e}"
-            log.exception("LLM 引擎重载失败")
+        else:
+            _loading_status["engine"] = "ok" if _brain_service.engine is not None else "error: 重载失败"
+            ENGINE_RELOADS.labels("error").inc()
+            log.error("LLM 引擎重载失败")
+
+    _brain_service.reload_async(_done)
+
+
+def apply_config_changes(changed: set[str]) -> dict[str, list[str]]:
+    """按变更的配置键执行定向重载，返回 {动作: 键列表}"""
+    from src.backend.core import config_diff as cd
+    actions = cd.classify(changed)
+    brain = _brain_service
+    for action, keys in actions.items():
+        try:
+            if action == cd.ENGINE:
+                reload_services()
+            elif brain is None:
+                continue
+            elif action == cd.PROMPT:
+                brain.reload_prompt()
+            elif action == cd.MEMORY:
+                brain.reload_memory()
+            elif action == cd.DIARY:
+                brain.reload_diary()
+            elif action == cd.BEHAVIOR:
+                brain.restart_behavior()
+            elif action == cd.BACKGROUND:
+                from src.backend.core.config import get
+                brain.tasks.configure(get("background.max_concurrency", 1),
+                                      get("background.idle_grace_seconds", 5))
+            elif action == cd.TTS and _perception_service is not None:
+                _perception_service.reload_tts(brain._loop)
+            elif action == cd.RESTART:
+                log.warning(f"以下配置需重启后端后生效: {keys}")
+        except Exception:
+            log.exception(f"配置变更处理失败: {action} {keys}")
+    return actions
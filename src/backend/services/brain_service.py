@@ -1,16 +1,23 @@
 """Brain 服务单例 - 封装 src/brain/ 核心逻辑"""
 import re
 import time
+import uuid
 import queue
 import asyncio
 import threading
 from src.backend.core.config import get
 from src.backend.core.logger import get_logger
+from src.backend.core.metrics import (
+    GENERATION_SECONDS, FIRST_TOKEN_SECONDS, GENERATION_CHUNKS, MEMORY_QUERY_SECONDS,
+)
 from src.backend.brain.engine import create_engine
 from src.backend.brain.memory import Memory
 from src.backend.brain.prompt import PromptManager
 from src.backend.brain.session import SessionManager
 from src.backend.brain.diary import DiaryWriter
+from src.backend.brain.diary_scheduler import DiaryScheduler
+from src.backend.brain.session_titler import SessionTitler
+from src.backend.services.task_queue import BackgroundTaskQueue
 
 log = get_logger("brain_service")
 
@@ -31,6 +38,13 @@ class BrainService:
         self._loop = asyncio.new_event_loop()
         self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
         self._thread.start()
+        # 主动消息、日记、标题等非交互推理统一走后台队列，交互聊天到达时抢占
+        self.tasks = BackgroundTaskQueue(
+            self._loop,
+            max_concurrency=get("background.max_concurrency", 1),
+            idle_grace=get("background.idle_grace_seconds", 5),
+        )
+        self.titler = SessionTitler(self)
 
         # 加载最近会话
         if self.session_mgr.index:
@@ -41,7 +55,16 @@ class BrainService:
         self._engine_lock = threading.Lock()
         self._engine_loading = False
         self._inferring = False  # 推理状态标志，供行为引擎检查
+        self._requests: dict = {}  # request_id -> 推理 future，供取消使用
+        self._request_engines: dict = {}  # request_id -> 处理该请求的引擎，切换引擎后仍能中止旧请求
+        # 各引擎上进行中的生成数，蓝绿重载时据此排空旧引擎
+        self._inflight: dict = {}
+        self._inflight_cond = threading.Condition()
+        self._reload_lock = threading.Lock()
+        self._reload_thread: threading.Thread | None = None
+        self._reload_pending = False
         self.behavior_engine = None
+        self.diary_scheduler = None
 
         log.info("BrainService 初始化完成（引擎延迟加载）")
 
@@ -50,6 +73,11 @@ class BrainService:
         """当前是否正在推理，供行为引擎检查"""
         return self._inferring
 
+    @property
+    def is_reloading(self) -> bool:
+        thread = self._reload_thread
+        return thread is not None and thread.is_alive()
+
     def _do_load_engine(self):
         """实际加载引擎逻辑，调用方需持有 _engine_lock"""
         self._engine_loading = True
@@ -64,8 +92,10 @@ class BrainService:
             self.prompt_mgr = PromptManager()
             self.diary = DiaryWriter()
             log.info("LLM 引擎已加载")
-            # 引擎加载完成后启动行为引擎
+            # 引擎加载完成后启动行为引擎与日记调度
             self._start_behavior_engine()
+            self._start_diary_scheduler()
+            self.titler.request_all()
         except Exception:
             self.engine = None
             self.memory = None
@@ -88,6 +118,16 @@ class BrainService:
             log.warning("行为引擎启动失败", exc_info=True)
             self.behavior_engine = None
 
+    def _start_diary_scheduler(self):
+        """日记生成不在聊天关键路径上，由调度器在定时或空闲时执行"""
+        if self.diary_scheduler and self.diary_scheduler.is_running:
+            self.diary_scheduler.stop()
+        self.diary_scheduler = None
+        if not get("diary.enabled", True):
+            return
+        self.diary_scheduler = DiaryScheduler(self)
+        self.diary_scheduler.start()
+
     def _ensure_engine(self):
         """延迟加载 LLM 引擎，线程安全"""
         if self.engine is not None:
@@ -97,17 +137,22 @@ class BrainService:
                 return
             self._do_load_engine()
 
-    def chat_stream(self, user_input: str):
-        """同步 generator，yield dict。供 SSE 端点消费。"""
+    def chat_stream(self, user_input: str, request_id: str | None = None):
+        """同步 generator，yield dict。供 SSE 端点消费。首项为 start，携带可用于取消的 request_id。"""
         if self.behavior_engine:
             self.behavior_engine.notify_user_input()
         if self._engine_loading:
             yield {"type": "error", "text": "AI 引擎正在加载中，请稍后再试"}
             return
         self._ensure_engine()
+        request_id = request_id or uuid.uuid4().hex
         q = queue.Queue()
-        future = asyncio.run_coroutine_threadsafe(self._stream_to_queue(user_input, q), self._loop)
+        # 先于推理协程投递到事件循环，保证后台任务在推理开始前已让出引擎
+        self.tasks.interactive_begin()
+        future = asyncio.run_coroutine_threadsafe(self._stream_to_queue(user_input, q, request_id), self._loop)
+        self._requests[request_id] = future
         try:
+            yield {"type": "start", "request_id": request_id}
             while True:
                 try:
                     item = q.get(timeout=300)
@@ -117,24 +162,57 @@ class BrainService:
                 if item is None:
                     break
                 yield item
-        except GeneratorExit:
+        finally:
+            # 客户端断开（GeneratorExit）或超时时中止推理；正常结束时为空操作
+            if not future.done():
+                self.cancel(request_id)
+            self._requests.pop(request_id, None)
+            self._request_engines.pop(request_id, None)
+            self.tasks.interactive_end()
+
+    def cancel(self, request_id: str | None = None) -> list[str]:
+        """取消进行中的推理，request_id 为空时取消全部；返回实际取消的 request_id"""
+        ids = [request_id] if request_id else list(self._requests)
+        cancelled = []
+        for rid in ids:
+            future = self._requests.pop(rid, None)
+            engine = self._request_engines.pop(rid, None) or self.engine
+            if future is None or future.done():
+                continue
+            if engine is not None:
+                asyncio.run_coroutine_threadsafe(engine.abort(rid), self._loop)
             future.cancel()
+            cancelled.append(rid)
+            log.info(f"推理已取消: {rid}")
+        return cancelled
 
-    async def _stream_to_queue(self, user_input: str, q: queue.Queue):
+    async def _stream_to_queue(self, user_input: str, q: queue.Queue, request_id: str | None = None):
         """核心推理流程，复用 src/brain/brain.py._think_and_reply 逻辑"""
         self._inferring = True
+        # 整轮只使用开始时的引擎，重载切换不影响进行中的回复
+        engine = self.engine
+        self._engine_acquire(engine)
+        if request_id:
+            self._request_engines[request_id] = engine
         try:
-            mem_ctx = self.memory.query(user_input) if self.memory else []
+            mem_ctx = []
+            if self.memory:
+                with MEMORY_QUERY_SECONDS.time():
+                    mem_ctx = self.memory.query(user_input)
             messages = self.prompt_mgr.build_messages(user_input, self.history, mem_ctx)
 
             full_reply = ""
             chunk_count = 0
             t0 = time.time()
-            async for chunk in self.engine.generate(messages):
+            async for chunk in engine.generate(messages, request_id=request_id):
+                if chunk_count == 0:
+                    FIRST_TOKEN_SECONDS.observe(time.time() - t0)
                 full_reply += chunk
                 chunk_count += 1
                 q.put({"type": "chunk", "text": chunk})
             elapsed = time.time() - t0
+            GENERATION_SECONDS.observe(elapsed)
+            GENERATION_CHUNKS.inc(chunk_count)
             if elapsed > 0:
                 self._last_inference_speed = round(chunk_count / elapsed, 1)
 
@@ -153,6 +231,7 @@ class BrainService:
                 self.history = self.history[-int(max_hist * 0.75):]
 
             self.session_mgr.save_messages(self.history)
+            self.titler.request(self.session_mgr.current_id)
             await self.socketio.emit("user_message", {"text": user_input}, namespace="/ws/events")
             await self.socketio.emit("ai_message", {"text": full_reply}, namespace="/ws/events")
             if self.memory:
@@ -164,21 +243,45 @@ class BrainService:
             self._trigger_tts(full_reply, emotion)
             # 推送表情更新
             await self.socketio.emit("expression", {"emotion": emotion}, namespace="/ws/events")
-            # 日记记录检查
-            if self.diary and get("diary.enabled", True):
-                for diary_type in ["daily", "weekly", "monthly", "yearly"]:
-                    try:
-                        await self.diary.write(self.history, self.engine, diary_type)
-                    except Exception:
-                        log.debug(f"{diary_type} 日记写入跳过", exc_info=True)
+            # 日记交给调度器在空闲时生成，不占用下一轮回复的引擎
+            if self.diary_scheduler:
+                self.diary_scheduler.notify_activity()
 
+        except asyncio.CancelledError:
+            q.put({"type": "cancelled", "request_id": request_id})
+            raise
         except Exception as e:
             log.exception("推理异常")
             q.put({"type": "error", "text": str(e)})
         finally:
             self._inferring = False
+            self._engine_release(engine)
             q.put(None)
 
+    def _engine_acquire(self, engine):
+        with self._inflight_cond:
+            self._inflight[engine] = self._inflight.get(engine, 0) + 1
+
+    def _engine_release(self, engine):
+        with self._inflight_cond:
+            count = self._inflight.get(engine, 0) - 1
+            if count > 0:
+                self._inflight[engine] = count
+            else:
+                self._inflight.pop(engine, None)
+                self._inflight_cond.notify_all()
+
+    def _drain(self, engine, timeout: float) -> int:
+        """等待 engine 上进行中的生成结束，返回超时后仍未结束的数量"""
+        deadline = time.monotonic() + timeout
+        with self._inflight_cond:
+            while self._inflight.get(engine):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._inflight_cond.wait(remaining)
+            return self._inflight.get(engine, 0)
+
     def _trigger_tts(self, text: str, emotion: str):
         """后台触发 TTS 合成"""
         from src.backend.services import get_perception
@@ -186,61 +289,164 @@ class BrainService:
         if perc:
             asyncio.run_coroutine_threadsafe(perc.synthesize_and_notify(text, emotion), self._loop)
 
-    def reload(self):
-        """重新加载引擎，失败时保留旧引擎继续服务"""
-        log.info("开始重新加载引擎...")
-        old_engine = self.engine
-        old_memory = self.memory
-        old_prompt_mgr = self.prompt_mgr
-        old_diary = self.diary
-        old_behavior = self.behavior_engine
+    def _emit_reload(self, stage: str, **extra):
+        """推送重载进度：loading / draining / done / error"""
+        try:
+            asyncio.run_coroutine_threadsafe(
+                self.socketio.emit("engine_reload", {"stage": stage, **extra}, namespace="/ws/events"),
+                self._loop,
+            )
+        except RuntimeError:
+            pass
 
+    def _retire_engine(self, engine):
+        """排空旧引擎上的生成后关闭它，释放 GPU 显存和连接池"""
+        timeout = get("brain.reload_drain_timeout", 60)
+        remaining = self._drain(engine, timeout)
+        if remaining:
+            log.warning(f"旧引擎仍有 {remaining} 个生成未在 {timeout}s 内结束，强制取消")
+            for rid, eng in list(self._request_engines.items()):
+                if eng is engine:
+                    self.cancel(rid)
+            self._drain(engine, 5)
+        if not hasattr(engine, "shutdown"):
+            return
         try:
-            # 先创建新引擎
-            new_engine = create_engine()
-            new_memory = None
-            if get("memory.enabled", False):
-                try:
-                    new_memory = Memory()
-                except Exception:
-                    log.warning("Memory 重新初始化失败，已禁用", exc_info=True)
-            new_prompt_mgr = PromptManager()
-            new_diary = DiaryWriter()
-
-            # 新引擎创建成功，替换旧引擎
-            self.engine = new_engine
-            self.memory = new_memory
-            self.prompt_mgr = new_prompt_mgr
-            self.diary = new_diary
-
-            # 停止旧的行为引擎
-            if old_behavior and old_behavior.is_running:
-                old_behavior.stop()
-
-            # 异步关闭旧引擎，释放 GPU 显存和连接池
-            if old_engine is not None and hasattr(old_engine, 'shutdown'):
-                try:
-                    asyncio.run_coroutine_threadsafe(old_engine.shutdown(), self._loop)
-                    log.info("旧引擎已提交异步关闭")
-                except Exception:
-                    log.warning("旧引擎关闭失败", exc_info=True)
+            asyncio.run_coroutine_threadsafe(engine.shutdown(), self._loop).result(timeout=30)
+            log.info("旧引擎已关闭")
+        except Exception:
+            log.warning("旧引擎关闭超时或失败", exc_info=True)
+            try:
+                import torch
+                torch.cuda.empty_cache()
+            except Exception:
+                pass
 
-            # 启动新的行为引擎
-            self._start_behavior_engine()
+    def reload(self, stop_first: bool | None = None):
+        """蓝绿重载 LLM 引擎：加载新引擎 → 原子切换 → 排空旧引擎进行中的生成 → 释放旧引擎
 
+        加载期间旧引擎继续服务，失败时保留旧引擎。显存不足以同时容纳两份模型时
+        使用 stop_first（brain.reload_stop_first）：先排空并关闭旧引擎再加载，期间聊天不可用。
+        """
+        if stop_first is None:
+            stop_first = get("brain.reload_stop_first", False)
+        mode = "stop_first" if stop_first else "blue_green"
+        log.info(f"开始重新加载引擎（{mode}）...")
+        self._emit_reload("loading", mode=mode)
+        if self.prompt_mgr is None:
+            # 从未成功加载过：按首次加载流程初始化全部组件
+            try:
+                with self._engine_lock:
+                    self._do_load_engine()
+            except Exception as e:
+                self._emit_reload("error", error=str(e))
+                log.error("引擎加载失败", exc_info=True)
+                raise
+            self._emit_reload("done", engine=self.engine.engine_type)
+            return
+        old_engine = self.engine
+        # 重载期间暂停后台推理任务，完成后它们会在新引擎上重跑
+        self.tasks.interactive_begin()
+        try:
+            if stop_first and old_engine is not None:
+                self._engine_loading = True
+                self._emit_reload("draining")
+                self._retire_engine(old_engine)
+                self.engine = None
+                old_engine = None
+            try:
+                # 切换：之后开始的请求使用新引擎，进行中的请求持有旧引擎直到结束
+                self.engine = create_engine()
+            except Exception as e:
+                self._emit_reload("error", error=str(e))
+                if old_engine is not None:
+                    log.error("引擎重新加载失败，保留旧引擎继续服务", exc_info=True)
+                else:
+                    log.error("引擎重新加载失败", exc_info=True)
+                raise
+            finally:
+                self._engine_loading = False
+
+            if old_engine is not None:
+                self._emit_reload("draining")
+                self._retire_engine(old_engine)
+            self._emit_reload("done", engine=self.engine.engine_type)
             log.info("引擎重新加载完成")
-        except Exception:
-            # 新引擎创建失败，保留旧引擎
-            self.engine = old_engine
-            self.memory = old_memory
-            self.prompt_mgr = old_prompt_mgr
-            self.diary = old_diary
-            self.behavior_engine = old_behavior
-            log.error("引擎重新加载失败，保留旧引擎继续服务", exc_info=True)
-            raise
+        finally:
+            self.tasks.interactive_end()
+
+    # ---- 定向重载：配置变更只影响单个子系统时使用 ----
+
+    def reload_prompt(self):
+        if self.prompt_mgr is not None:
+            self.prompt_mgr = PromptManager()
+            log.info("系统提示词已重新加载")
+
+    def reload_memory(self):
+        if self.engine is None:
+            return
+        new_memory = None
+        if get("memory.enabled", False):
+            try:
+                new_memory = Memory()
+            except Exception:
+                log.warning("Memory 重新初始化失败，已禁用", exc_info=True)
+        self.memory = new_memory
+        log.info(f"记忆库已重新打开（{'启用' if new_memory else '禁用'}）")
+
+    def reload_diary(self):
+        if self.engine is None:
+            return
+        old = self.diary
+        self.diary = DiaryWriter()
+        self._start_diary_scheduler()
+        if old is not None:
+            # 旧索引库的 SQLite 连接不会随对象回收及时释放，显式关闭
+            old.store.close()
+        log.info("日记模块已重新加载")
+
+    def restart_behavior(self):
+        if self.behavior_engine and self.behavior_engine.is_running:
+            self.behavior_engine.stop()
+        self.behavior_engine = None
+        if self.engine is not None:
+            self._start_behavior_engine()
+
+    def reload_async(self, on_done=None) -> bool:
+        """在后台线程执行 reload；重载进行中再次调用时合并为结束后的一次重载
+
+        on_done(ok: bool) 在每次重载结束后于重载线程中调用。返回是否启动了新线程。
+        """
+        with self._reload_lock:
+            if self.is_reloading:
+                self._reload_pending = True
+                return False
+            self._reload_thread = threading.Thread(
+                target=self._reload_worker, args=(on_done,), name="engine-reload", daemon=True,
+            )
+            self._reload_thread.start()
+            return True
+
+    def _reload_worker(self, on_done):
+        while True:
+            ok = True
+            try:
+                self.reload()
+            except Exception:
+                ok = False
+            if on_done is not None:
+                on_done(ok)
+            with self._reload_lock:
+                if not self._reload_pending:
+                    self._reload_thread = None
+                    return
+                self._reload_pending = False
 
     def shutdown(self):
-        """关闭 BrainService，停止行为引擎"""
+        """关闭 BrainService，停止行为引擎、日记调度与后台任务队列"""
         if self.behavior_engine and self.behavior_engine.is_running:
             self.behavior_engine.stop()
             log.info("行为引擎已随 BrainService 关闭")
+        if self.diary_scheduler and self.diary_scheduler.is_running:
+            self.diary_scheduler.stop()
+        self.tasks.close()
@@ -1,24 +1,140 @@
-"""日志服务 - WebSocket 广播 + JSON文件 + TTS日志尾随"""
+"""日志服务 - WebSocket 广播 + JSON文件 + TTS日志尾随
+
+处理器都运行在 core.logger 的写线程上：emit 只做缓冲，flush_batch 在一批记录处理完后统一落盘/推送。
+"""
+import asyncio
+import ctypes
 import json
 import logging
 import os
+import re
+import select
+import struct
+import sys
 import threading
 import time
-import traceback
 from collections import deque
-from pathlib import Path
 
-from src.backend.core.logger import _LOG_FMT, _DATE_FMT, _original_stderr, WerkzeugFilter
+from src.backend.core.config import get
+from src.backend.core.log_rotation import LogRotator
+from src.backend.core.logger import _LOG_FMT, _DATE_FMT, _original_stderr, WerkzeugFilter, add_handler, latest_log_dir
 
 # 全局日志缓冲，供客户端连接时回放
 _log_buffer: deque = deque(maxlen=200)
 
+# Socket.IO 所在的服务器事件循环，由 app 启动事件注入
+_server_loop: asyncio.AbstractEventLoop | None = None
+
+
+def set_server_loop(loop: asyncio.AbstractEventLoop):
+    global _server_loop
+    _server_loop = loop
+
+
+def level_no(name, default: int = logging.INFO) -> int:
+    """日志级别名 -> 数值，未知名称返回 default"""
+    value = logging.getLevelName(str(name or "").upper())
+    return value if isinstance(value, int) else default
+
+
+# /ws/logs 客户端 sid -> 最低日志级别，仅在服务器事件循环上读写
+_log_clients: dict[str, int] = {}
+
+
+def register_log_client(sid: str, level=None):
+    _log_clients[sid] = level_no(level)
+
+
+def unregister_log_client(sid: str):
+    _log_clients.pop(sid, None)
+
+
+def replay_entries(sid: str) -> list[dict]:
+    """连接时回放的缓冲日志，按该客户端的级别过滤"""
+    min_level = _log_clients.get(sid, logging.INFO)
+    return [e for e in list(_log_buffer) if level_no(e["level"]) >= min_level]
+
+
+class LogBroadcaster:
+    """在服务器事件循环上合并日志，每 logging.ws_batch_interval_ms 毫秒向各客户端推送一次 log_batch。
+
+    每秒最多转发 logging.ws_max_per_second 条 WARNING 以下的日志，超出的计数后以一条"已丢弃"标记告知客户端。
+    """
+
+    def __init__(self, socketio):
+        self.socketio = socketio
+        self._pending: list[dict] = []
+        self._dropped = 0
+        self._window_start = 0.0
+        self._window_count = 0
+        self._scheduled = False
+
+    def push(self, entries: list[dict]):
+        """由写线程经 call_soon_threadsafe 调用"""
+        if not _log_clients:
+            return
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start, self._window_count = now, 0
+        cap = get("logging.ws_max_per_second", 200)
+        if cap > 0:
+            # WARNING 及以上不受限流影响，否则 INFO 刷屏时只订阅 ERROR 的客户端也会丢失告警
+            room = max(0, cap - self._window_count)
+            accepted = []
+            for entry in entries:
+                if level_no(entry["level"]) >= logging.WARNING:
+                    accepted.append(entry)
+                elif room:
+                    accepted.append(entry)
+                    room -= 1
+                else:
+                    self._dropped += 1
+            self._window_count += len(accepted)
+        else:
+            accepted = entries
+        self._pending.extend(accepted)
+        if not self._scheduled:
+            self._scheduled = True
+            interval = max(0, get("logging.ws_batch_interval_ms", 200)) / 1000
+            asyncio.get_running_loop().call_later(interval, self._start_flush)
+
+    def _start_flush(self):
+        asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        self._scheduled = False
+        batch, self._pending = self._pending, []
+        dropped, self._dropped = self._dropped, 0
+        if dropped:
+            batch.append({
+                "time": time.strftime(_DATE_FMT),
+                "level": "WARNING",
+                "module": "log_service",
+                "message": f"日志过多，已丢弃 {dropped} 条日志",
+                "dropped": dropped,
+            })
+        if not batch:
+            return
+        by_level: dict[int, list[dict]] = {}
+        for sid, min_level in list(_log_clients.items()):
+            if min_level not in by_level:
+                by_level[min_level] = [e for e in batch
+                                       if "dropped" in e or level_no(e["level"]) >= min_level]
+            entries = by_level[min_level]
+            if not entries:
+                continue
+            try:
+                await self.socketio.emit("log_batch", entries, to=sid, namespace="/ws/logs")
+            except Exception as e:
+                print(f"[LogBroadcaster] {e}", file=_original_stderr)
+
 
 class WebSocketLogHandler(logging.Handler):
     def __init__(self, socketio):
         super().__init__()
-        self.socketio = socketio
+        self.broadcaster = LogBroadcaster(socketio)
         self.setFormatter(logging.Formatter(_LOG_FMT, datefmt=_DATE_FMT))
+        self._pending: list[dict] = []
 
     def emit(self, record):
         try:
@@ -29,35 +145,39 @@ class WebSocketLogHandler(logging.Handler):
                 "message": record.getMessage(),
             }
             _log_buffer.append(entry)
-            import asyncio
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.run_coroutine_threadsafe(
-                        self.socketio.emit("log", entry, namespace="/ws/logs"),
-                        loop
-                    )
-                else:
-                    loop.run_until_complete(self.socketio.emit("log", entry, namespace="/ws/logs"))
-            except RuntimeError:
-                pass
+            self._pending.append(entry)
         except Exception as e:
             print(f"[LogHandler] {e}", file=_original_stderr)
 
+    def flush_batch(self):
+        if not self._pending:
+            return
+        entries, self._pending = self._pending, []
+        loop = _server_loop
+        if loop is None or loop.is_closed():
+            return
+        # 每批只跨线程投递一次，合并与限流在事件循环上由 LogBroadcaster 完成
+        try:
+            loop.call_soon_threadsafe(self.broadcaster.push, entries)
+        except RuntimeError:
+            pass
+
 
 class JsonFileLogHandler(logging.Handler):
     def __init__(self, log_dir):
         super().__init__()
         os.makedirs(log_dir, exist_ok=True)
-        self._file = open(os.path.join(log_dir, "structured.jsonl"), "a", encoding="utf-8")
+        path = os.path.join(log_dir, "structured.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+        self.rotator = LogRotator(path)
         self.setFormatter(logging.Formatter(_LOG_FMT, datefmt=_DATE_FMT))
 
     def emit(self, record):
         try:
-            exc = None
-            if record.exc_info and record.exc_info[0] is not None:
-                exc = "".join(traceback.format_exception(*record.exc_info))
+            # 异常堆栈已由 QueueHandler.prepare 格式化到 exc_text
+            exc = record.exc_text or None
             entry = {
+                "ts": round(record.created, 3),
                 "time": self.formatter.formatTime(record, _DATE_FMT),
                 "level": record.levelname,
                 "module": record.name,
@@ -68,50 +188,189 @@ class JsonFileLogHandler(logging.Handler):
                 "exc_info": exc,
             }
             self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
-            self._file.flush()
         except Exception as e:
             print(f"[JsonLogHandler] {e}", file=_original_stderr)
 
+    def flush_batch(self):
+        self._file.flush()
+        self.rotator.maybe_rotate(self._file)
+
     def close(self):
         self._file.close()
         super().close()
 
 
+class _Inotify:
+    """Linux inotify 的最小 ctypes 封装，只关心目录中某个文件名的事件"""
+    _IN_MODIFY = 0x002
+    _IN_CLOSE_WRITE = 0x008
+    _IN_MOVED_FROM = 0x040
+    _IN_MOVED_TO = 0x080
+    _IN_CREATE = 0x100
+    _IN_DELETE = 0x200
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, fd: int, name: bytes):
+        self._fd = fd
+        self._name = name
+
+    @classmethod
+    def create(cls, path: str) -> "_Inotify | None":
+        """监视 path 所在目录；非 Linux 或调用失败时返回 None，由调用方退回轮询"""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            directory = os.path.dirname(os.path.abspath(path))
+            mask = (cls._IN_MODIFY | cls._IN_CLOSE_WRITE | cls._IN_MOVED_FROM
+                    | cls._IN_MOVED_TO | cls._IN_CREATE | cls._IN_DELETE)
+            if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+                os.close(fd)
+                return None
+        except (OSError, AttributeError):
+            return None
+        return cls(fd, os.fsencode(os.path.basename(path)))
+
+    def wait(self, timeout: float) -> bool:
+        """等待目标文件的事件，超时返回 False；同目录其他文件的事件被忽略"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                return False
+            data = os.read(self._fd, 65536)
+            offset = 0
+            while offset + self._EVENT.size <= len(data):
+                _, _, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if name == self._name:
+                    return True
+
+    def close(self):
+        os.close(self._fd)
+
+
 class TtsLogTailer:
+    """跟随 GPT-SoVITS 的 tts.log，逐行转发到 "tts" logger。
+
+    Linux 上由 inotify 唤醒，其他平台轮询；检测轮转/截断后从新文件开头继续读。
+    """
+    _READ_SIZE = 65536
+    _MAX_LINE = 8192
+    _POLL_INTERVAL = 0.5
+    _MISSING_INTERVAL = 2.0
+    # tqdm 进度条特征，用于过滤刷屏行
+    _PROGRESS_RE = re.compile(r"%\||it/s|s/it|[█▏▎▍▌▋▊▉]")
+
     def __init__(self, log_path):
         self.log_path = log_path
         self._logger = logging.getLogger("tts")
+        self._stop = threading.Event()
+        self._skipping = False
 
     def start(self):
-        t = threading.Thread(target=self._tail, daemon=True)
+        t = threading.Thread(target=self._tail, name="tts-log-tailer", daemon=True)
         t.start()
 
-    # tqdm 进度条特征字符，用于过滤刷屏行
-    _PROGRESS_CHARS = set("█▏▎▍▌▋▊▉")
+    def stop(self):
+        self._stop.set()
 
     def _tail(self):
-        while not os.path.exists(self.log_path):
-            time.sleep(2)
-        with open(self.log_path, "rb") as f:
-            f.seek(0, 2)  # seek to end
-            buf = b""
-            while True:
-                chunk = f.read(4096)
+        notifier = _Inotify.create(self.log_path)
+        wait = notifier.wait if notifier else self._stop.wait
+        f = None
+        from_start = False  # 首次打开只跟随新内容，轮转后的新文件从头读
+        buf = bytearray()
+        try:
+            while not self._stop.is_set():
+                if f is None:
+                    f = self._open(from_start)
+                    if f is None:
+                        wait(self._MISSING_INTERVAL)
+                        continue
+                    buf.clear()
+                    self._skipping = False
+                chunk = f.read(self._READ_SIZE)
                 if chunk:
                     buf += chunk
-                    while b"\n" in buf:
-                        raw_line, buf = buf.split(b"\n", 1)
-                        line = self._decode_line(raw_line)
-                        line = line.rstrip()
-                        if not line:
-                            continue
-                        if "%|" in line or "it/s" in line or "s/it" in line or "\r" in line:
-                            continue
-                        if any(c in self._PROGRESS_CHARS for c in line):
-                            continue
-                        self._logger.info(line)
-                else:
-                    time.sleep(0.5)
+                    self._drain(buf)
+                    continue
+                if self._rotated(f):
+                    f.close()
+                    f, from_start = None, True
+                    continue
+                wait(self._POLL_INTERVAL)
+        finally:
+            if f is not None:
+                f.close()
+            if notifier is not None:
+                notifier.close()
+
+    def _open(self, from_start: bool):
+        try:
+            f = open(self.log_path, "rb")
+        except OSError:
+            return None
+        if not from_start:
+            f.seek(0, 2)
+        return f
+
+    def _rotated(self, f) -> bool:
+        """文件被替换（inode 变化）、删除或截断时返回 True"""
+        try:
+            st = os.stat(self.log_path)
+        except OSError:
+            return True
+        cur = os.fstat(f.fileno())
+        if (st.st_ino, st.st_dev) != (cur.st_ino, cur.st_dev):
+            return True
+        return st.st_size < f.tell()
+
+    def _drain(self, buf: bytearray):
+        """输出 buf 中所有完整行，剩余半行留在 buf；超长无换行内容截断输出后丢弃到下一个换行
+
+        只按 \n 分行；行内 \r 之前的内容是被回车覆盖的进度刷新，只保留最后一个 \r 之后的部分。
+        """
+        end = buf.rfind(b"\n")
+        if end < 0:
+            # 只用 \r 刷新的进度条不会出现 \n，提前丢弃已被覆盖的部分；末尾的 \r 可能属于尚未读到的 \r\n
+            cr = buf.rfind(b"\r", 0, len(buf) - 1)
+            if cr >= 0:
+                del buf[:cr + 1]
+            if len(buf) > self._MAX_LINE:
+                if not self._skipping:
+                    self._emit(bytes(buf[:self._MAX_LINE]), truncated=True)
+                    self._skipping = True
+                buf.clear()
+            return
+        lines = bytes(buf[:end]).split(b"\n")
+        del buf[:end + 1]
+        if self._skipping:
+            # 第一段是被截断长行的剩余部分
+            lines = lines[1:]
+            self._skipping = False
+        for raw_line in lines:
+            raw_line = raw_line.rstrip(b"\r").rsplit(b"\r", 1)[-1]
+            if len(raw_line) > self._MAX_LINE:
+                self._emit(raw_line[:self._MAX_LINE], truncated=True)
+            else:
+                self._emit(raw_line)
+
+    def _emit(self, raw_line: bytes, truncated: bool = False):
+        line = self._decode_line(raw_line).rstrip()
+        if not line or self._PROGRESS_RE.search(line):
+            return
+        if truncated:
+            line += " …(已截断)"
+        self._logger.info(line)
 
     @staticmethod
     def _decode_line(raw: bytes) -> str:
@@ -131,14 +390,14 @@ class LogService:
         ws_handler = WebSocketLogHandler(socketio)
         ws_handler.setLevel(logging.INFO)
         ws_handler.addFilter(WerkzeugFilter())
-        root.addHandler(ws_handler)
+        add_handler(ws_handler)
 
         # JSON file handler - 找 logs/ 下最新子目录
-        log_dir = self._find_latest_log_dir()
+        log_dir = latest_log_dir()
         if log_dir:
             json_handler = JsonFileLogHandler(log_dir)
             json_handler.setLevel(logging.INFO)
-            root.addHandler(json_handler)
+            add_handler(json_handler)
 
         root.setLevel(logging.INFO)
 
@@ -149,15 +408,3 @@ class LogService:
         if tts_log:
             self.tts_tailer = TtsLogTailer(tts_log)
             self.tts_tailer.start()
-
-    @staticmethod
-    def _find_latest_log_dir():
-        env_root = os.environ.get("YUEXIA_ROOT", "").strip()
-        if env_root:
-            logs_root = Path(env_root) / "logs"
-        else:
-            logs_root = Path("logs")
-        if not logs_root.is_dir():
-            return None
-        subdirs = sorted([d for d in logs_root.iterdir() if d.is_dir()])
-        return str(subdirs[-1]) if subdirs else None
@@ -1,11 +1,22 @@
 """感知服务 - 封装 src/perception/tts"""
+import asyncio
+import atexit
 import os
+import time
+from src.backend.core.config import get
 from src.backend.core.logger import get_logger
+from src.backend.core.metrics import TTS_QUEUE_DEPTH, TTS_SECONDS
 from src.backend.perception.tts import TTSEngine, TTSError
 
 log = get_logger("perception_service")
 
 
+def _audio_url(path: str) -> str:
+    """TTS 输出文件路径 -> 前端可访问的 /audio/ URL"""
+    filename = os.path.basename(path.replace("\\", "/"))
+    return f"/audio/{filename}"
+
+
 class PerceptionService:
     def __init__(self, socketio, brain=None):
         self.socketio = socketio
@@ -14,19 +25,53 @@ class PerceptionService:
         log.info("PerceptionService 初始化完成")
 
     async def synthesize_and_notify(self, text: str, emotion: str):
+        TTS_QUEUE_DEPTH.inc()
+        t0 = time.time()
+        status = "ok"
         try:
             path = await self.tts.synthesize(text, emotion)
             if path:
                 await self.socketio.emit("tts_done", {"path": path, "emotion": emotion}, namespace="/ws/events")
                 # 回写 tts_path 到 brain.history 并持久化
                 if self.brain and self.brain.history:
-                    filename = os.path.basename(path.replace("\\", "/"))
-                    audio_url = f"/audio/{filename}"
+                    audio_url = _audio_url(path)
                     for msg in reversed(self.brain.history):
                         if msg.get("role") == "assistant":
                             msg["tts_path"] = audio_url
                             break
                     self.brain.session_mgr.save_messages(self.brain.history)
         except TTSError as e:
+            status = "error"
             log.error(f"TTS 合成失败: {e}")
             await self.socketio.emit("tts_error", {"error": str(e)}, namespace="/ws/events")
+        finally:
+            TTS_QUEUE_DEPTH.dec()
+            TTS_SECONDS.labels(status).observe(time.time() - t0)
+
+    async def prepare_audio(self, text: str, emotion: str = "neutral") -> str | None:
+        """预先合成语音，不推送也不回写历史，返回音频 URL"""
+        t0 = time.time()
+        try:
+            path = await self.tts.synthesize(text, emotion)
+        except TTSError as e:
+            TTS_SECONDS.labels("error").observe(time.time() - t0)
+            log.warning(f"预合成语音失败: {e}")
+            return None
+        TTS_SECONDS.labels("ok").observe(time.time() - t0)
+        return _audio_url(path) if path else None
+
+    def reload_tts(self, loop: asyncio.AbstractEventLoop):
+        """重建 TTS 客户端；旧客户端等进行中的合成超时后在其所属事件循环上关闭"""
+        old = self.tts
+        self.tts = TTSEngine()
+        log.info("TTS 客户端已重建")
+        asyncio.run_coroutine_threadsafe(self._close_later(old), loop)
+
+    @staticmethod
+    async def _close_later(tts: TTSEngine):
+        await asyncio.sleep(get("perception.tts.timeout", 60))
+        try:
+            await tts.close()
+        except Exception:
+            log.debug("关闭旧 TTS 客户端失败", exc_info=True)
+        atexit.unregister(tts._sync_close)
@@ -0,0 +1,97 @@
+"""系统资源采样 — 后台线程定时采集 CPU/RAM/GPU，请求直接读缓存"""
+import threading
+import time
+from collections import deque
+
+import psutil
+
+from src.backend.core.config import get
+from src.backend.core.logger import get_logger
+
+log = get_logger("system_sampler")
+
+
+def _gpu_info():
+    try:
+        import GPUtil
+        gpus = GPUtil.getGPUs()
+        if gpus:
+            g = gpus[0]
+            return {"name": g.name, "mem_used": round(g.memoryUsed / 1024, 1), "mem_total": round(g.memoryTotal / 1024, 1), "load": round(g.load * 100)}
+    except Exception:
+        pass
+    return None
+
+
+class SystemSampler:
+    """按固定间隔采样并写入环形缓冲，GPUtil 会启动 nvidia-smi 子进程，因此只在采样线程里调用"""
+
+    def __init__(self, interval: float | None = None, history_size: int | None = None):
+        self.interval = max(0.5, float(interval or get("system.sample_interval", 2.0)))
+        size = int(history_size or get("system.history_size", 300))
+        self._history: deque = deque(maxlen=max(1, size))
+        self._latest: dict | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # 预热 psutil cpu_percent，interval=None 首次调用返回 0.0
+        psutil.cpu_percent(interval=None)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+        log.info(f"系统采样已启动，间隔 {self.interval}s，保留 {self._history.maxlen} 条")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # 首次采样也在采样线程中进行，start() 不会阻塞调用方
+        while True:
+            try:
+                self._sample()
+            except Exception:
+                log.debug("系统采样失败", exc_info=True)
+            if self._stop.wait(self.interval):
+                break
+
+    def _sample(self):
+        mem = psutil.virtual_memory()
+        sample = {
+            "time": time.time(),
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "ram_used": round(mem.used / (1024 ** 3), 1),
+            "ram_total": round(mem.total / (1024 ** 3), 1),
+            "gpu": _gpu_info(),
+        }
+        # 先入缓冲再替换引用，读取方无需加锁
+        self._history.append(sample)
+        self._latest = sample
+
+    def latest(self) -> dict | None:
+        return self._latest
+
+    def history(self, seconds: float | None = None) -> list[dict]:
+        samples = list(self._history)
+        if seconds is not None and samples:
+            cutoff = time.time() - seconds
+            samples = [s for s in samples if s["time"] >= cutoff]
+        return samples
+
+
+_sampler: SystemSampler | None = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> SystemSampler:
+    """获取全局采样器；正常由 boot_services 启动，首次调用时若尚未启动则在此启动"""
+    global _sampler
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                sampler = SystemSampler()
+                sampler.start()
+                _sampler = sampler
+    return _sampler
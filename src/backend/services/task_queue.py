@@ -0,0 +1,203 @@
+"""后台 LLM 任务队列 — 优先级、并发上限与抢占，保证交互式聊天始终优先"""
+import asyncio
+import concurrent.futures
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+from src.backend.core.logger import get_logger
+
+log = get_logger("task_queue")
+
+# 数值越小越先执行
+PRIORITY_PROACTIVE = 10
+PRIORITY_TITLE = 20
+PRIORITY_DIARY = 30
+
+
+@dataclass(eq=False)
+class BackgroundTask:
+    name: str
+    factory: Callable[[], Awaitable]
+    priority: int
+    preemptible: bool = True
+    key: str | None = None
+    future: concurrent.futures.Future = field(default_factory=concurrent.futures.Future)
+    preemptions: int = 0
+    _task: asyncio.Task | None = None
+    _preempted: bool = False
+
+
+class BackgroundTaskQueue:
+    """运行在 BrainService 事件循环上的后台任务调度器。
+
+    - 有交互式推理进行时不启动新任务，且聊天结束后需空闲 idle_grace 秒才恢复
+    - 聊天开始时取消可抢占的运行中任务并重新入队（factory 会被再次调用）
+    - submit / interactive_begin / interactive_end 可在任意线程调用
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_concurrency: int = 1,
+                 idle_grace: float = 5.0, max_preemptions: int = 5):
+        self._loop = loop
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.idle_grace = max(0.0, float(idle_grace))
+        self.max_preemptions = max_preemptions
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._running: set[BackgroundTask] = set()
+        self._keys: dict[str, BackgroundTask] = {}
+        self._interactive = 0
+        self._idle_since = time.monotonic()
+        self._wake_handle: asyncio.TimerHandle | None = None
+        self._closed = False
+
+    # ---- 线程安全的公共接口 ----
+
+    def submit(self, name: str, factory: Callable[[], Awaitable], priority: int = PRIORITY_DIARY,
+               preemptible: bool = True, key: str | None = None) -> concurrent.futures.Future:
+        """提交后台任务，返回 concurrent.futures.Future；相同 key 的任务未完成时复用已有 future"""
+        task = BackgroundTask(name, factory, priority, preemptible, key)
+        task.future.add_done_callback(lambda f: f.cancelled() and self._call(self._discard, task))
+        self._call(self._enqueue, task)
+        return task.future
+
+    def interactive_begin(self):
+        self._call(self._on_interactive_begin)
+
+    def interactive_end(self):
+        self._call(self._on_interactive_end)
+
+    def close(self):
+        self._call(self._close)
+
+    def configure(self, max_concurrency: int | None = None, idle_grace: float | None = None):
+        """运行中调整并发上限与空闲等待时间"""
+        self._call(self._configure, max_concurrency, idle_grace)
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def _call(self, fn, *args):
+        try:
+            self._loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            log.debug("事件循环已关闭，忽略后台任务操作")
+
+    # ---- 以下方法只在事件循环线程中执行 ----
+
+    def _enqueue(self, task: BackgroundTask):
+        if self._closed:
+            task.future.cancel()
+            return
+        if task.key:
+            existing = self._keys.get(task.key)
+            if existing is not None and not existing.future.done():
+                log.debug(f"后台任务已在队列中，合并: {task.key}")
+                _chain(existing.future, task.future)
+                return
+            self._keys[task.key] = task
+        heapq.heappush(self._heap, (task.priority, next(self._seq), task))
+        self._dispatch()
+
+    def _configure(self, max_concurrency, idle_grace):
+        if max_concurrency is not None:
+            self.max_concurrency = max(1, int(max_concurrency))
+        if idle_grace is not None:
+            self.idle_grace = max(0.0, float(idle_grace))
+        self._dispatch()
+
+    def _discard(self, task: BackgroundTask):
+        """外部取消 future 时，移出队列或中止运行"""
+        if task._task is not None and not task._task.done():
+            task._task.cancel()
+        self._heap = [item for item in self._heap if item[2] is not task]
+        heapq.heapify(self._heap)
+        if task.key and self._keys.get(task.key) is task:
+            del self._keys[task.key]
+
+    def _on_interactive_begin(self):
+        self._interactive += 1
+        for task in list(self._running):
+            if task.preemptible and task._task is not None and not task._task.done():
+                log.info(f"交互请求到达，抢占后台任务: {task.name}")
+                task._preempted = True
+                task._task.cancel()
+
+    def _on_interactive_end(self):
+        self._interactive = max(0, self._interactive - 1)
+        if self._interactive == 0:
+            self._idle_since = time.monotonic()
+            self._dispatch()
+
+    def _dispatch(self):
+        if self._wake_handle is not None:
+            self._wake_handle.cancel()
+            self._wake_handle = None
+        if self._interactive > 0 or self._closed:
+            return
+        wait = self._idle_since + self.idle_grace - time.monotonic()
+        if wait > 0:
+            self._wake_handle = self._loop.call_later(wait, self._dispatch)
+            return
+        while self._heap and len(self._running) < self.max_concurrency:
+            _, _, task = heapq.heappop(self._heap)
+            if task.future.done():
+                continue
+            self._running.add(task)
+            task._preempted = False
+            task._task = self._loop.create_task(self._run(task))
+
+    async def _run(self, task: BackgroundTask):
+        requeue = False
+        try:
+            result = await task.factory()
+            if not task.future.done():
+                task.future.set_result(result)
+        except asyncio.CancelledError:
+            if task._preempted and not self._closed and task.preemptions < self.max_preemptions:
+                task.preemptions += 1
+                requeue = True
+            elif not task.future.done():
+                task.future.cancel()
+        except Exception as e:
+            log.warning(f"后台任务失败: {task.name}", exc_info=True)
+            if not task.future.done():
+                task.future.set_exception(e)
+        finally:
+            self._running.discard(task)
+            task._task = None
+            if requeue:
+                log.info(f"后台任务已重新入队: {task.name}（第 {task.preemptions} 次抢占）")
+                heapq.heappush(self._heap, (task.priority, next(self._seq), task))
+            elif task.key and self._keys.get(task.key) is task:
+                del self._keys[task.key]
+            self._dispatch()
+
+    def _close(self):
+        self._closed = True
+        for _, _, task in self._heap:
+            task.future.cancel()
+        self._heap.clear()
+        for task in list(self._running):
+            if task._task is not None:
+                task._task.cancel()
+
+
+def _chain(source: concurrent.futures.Future, target: concurrent.futures.Future):
+    """source 完成时把结果转给 target"""
+    def _done(f: concurrent.futures.Future):
+        if target.done():
+            return
+        if f.cancelled():
+            target.cancel()
+        elif f.exception() is not None:
+            target.set_exception(f.exception())
+        else:
+            target.set_result(f.result())
+    source.add_done_callback(_done)
@@ -4,8 +4,18 @@ import type { StreamChunk } from '../types'
 export function useChatStream() {
   const [streaming, setStreaming] = useState(false)
   const abortRef = useRef<AbortController | null>(null)
+  const requestIdRef = useRef<string | null>(null)
 
   const cancel = useCallback(() => {
+    // 断开连接之外显式通知后端中止推理，释放 GPU
+    if (abortRef.current && requestIdRef.current) {
+      fetch('/api/chat/cancel', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ request_id: requestIdRef.current }),
+      }).catch(() => {})
+    }
+    requestIdRef.current = null
     abortRef.current?.abort()
     abortRef.current = null
   }, [])
@@ -43,7 +53,12 @@ export function useChatStream() {
         for (const line of lines) {
           if (line.startsWith('data: ')) {
             try {
-              onChunk(JSON.parse(line.slice(6)))
+              const chunk: StreamChunk = JSON.parse(line.slice(6))
+              if (chunk.type === 'start') {
+                requestIdRef.current = chunk.request_id || null
+                continue
+              }
+              onChunk(chunk)
             } catch {
               // 忽略畸形 JSON 行
             }
@@ -57,6 +72,7 @@ export function useChatStream() {
     } finally {
       if (abortRef.current === controller) {
         abortRef.current = null
+        requestIdRef.current = null
       }
       setStreaming(false)
     }
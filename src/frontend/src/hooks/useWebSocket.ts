@@ -6,8 +6,8 @@ export function useLogSocket() {
   const [logs, setLogs] = useState<LogEntry[]>([])
   useEffect(() => {
     const socket: Socket = io('/ws/logs', { reconnection: true, reconnectionDelay: 1000 })
-    socket.on('log', (entry: LogEntry) => {
-      setLogs(prev => [...prev.slice(-4999), entry])
+    socket.on('log_batch', (entries: LogEntry[]) => {
+      setLogs(prev => [...prev, ...entries].slice(-5000))
     })
     return () => { socket.disconnect() }
   }, [])
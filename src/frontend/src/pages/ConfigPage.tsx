@@ -6,7 +6,7 @@ import { useSystemStatus } from '../stores/useSystemStore'
 import { toast } from '../stores/useToastStore'
 
 const ACCENT_COLORS = ['#60cdff', '#ff6060', '#60ff8b', '#ffc460', '#c260ff']
-const ENGINES = ['transformers', 'vllm', 'api'] as const
+const ENGINES = ['transformers', 'vllm', 'llamacpp', 'api'] as const
 const TTS_ENGINES = ['local', 'api'] as const
 const EMBEDDING_MODELS = ['text-embedding-3-small', 'm3e-base', 'bge-large-zh'] as const
 const ASR_SIZES = ['tiny', 'base', 'small', 'medium', 'large-v3'] as const
@@ -242,7 +242,7 @@ export default function ConfigPage() {
                     {ENGINES.map(e => (
                       <button key={e} onClick={() => updateField('brain.engine', e)}
                         className={`flex-1 py-2 text-xs font-medium rounded transition-colors ${cfg.brain?.engine === e ? 'bg-white/10 shadow text-white border border-white/10' : 'text-gray-500 hover:text-white'}`}>
-                        {e === 'vllm' ? 'vLLM (CUDA)' : e === 'transformers' ? 'Transformers' : 'API 调用'}
+                        {e === 'vllm' ? 'vLLM (CUDA)' : e === 'transformers' ? 'Transformers' : e === 'llamacpp' ? 'llama.cpp (GGUF)' : 'API 调用'}
                       </button>
                     ))}
                   </div>
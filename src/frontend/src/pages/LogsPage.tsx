@@ -10,6 +10,7 @@ export default function LogsPage() {
   const logs = useSocketStore(s => s.logs)
   const logsConnected = useSocketStore(s => s.logsConnected)
   const clearLogs = useSocketStore(s => s.clearLogs)
+  const setLogLevel = useSocketStore(s => s.setLogLevel)
   const [filter, setFilter] = useState<string>('ALL')
   const [search, setSearch] = useState('')
   const [autoScroll, setAutoScroll] = useState(true)
@@ -30,6 +31,11 @@ export default function LogsPage() {
     [logs, filter, search]
   )
 
+  // 服务端只推送不低于所选级别的日志，减少刷屏时的传输量
+  useEffect(() => {
+    setLogLevel(filter === 'ALL' ? 'INFO' : filter)
+  }, [filter, setLogLevel])
+
   useEffect(() => {
     if (autoScroll && scrollRef.current) {
       scrollRef.current.scrollTo(0, scrollRef.current.scrollHeight)
@@ -33,7 +33,8 @@ interface ChatState {
   appendMessage: (msg: ChatMessage) => void
   updateLastAssistantMessage: (updater: (content: string) => string) => void
   updateLastAssistantTtsPath: (path: string) => void
-  handleProactiveMessage: (text: string) => void
+  handleProactiveMessage: (text: string, ttsPath?: string) => void
+  updateSessionTitle: (id: string, title: string) => void
 }
 
 export const useChatStore = create<ChatState>((set, get) => ({
@@ -134,9 +135,17 @@ export const useChatStore = create<ChatState>((set, get) => ({
     })
   },
 
-  handleProactiveMessage: (text: string) => {
+  handleProactiveMessage: (text: string, ttsPath?: string) => {
+    const msg: ChatMessage = { id: genMsgId(), role: 'assistant', content: text }
+    if (ttsPath) msg.tts_path = ttsPath
     set(state => ({
-      messages: [...state.messages, { id: genMsgId(), role: 'assistant', content: text }],
+      messages: [...state.messages, msg],
+    }))
+  },
+
+  updateSessionTitle: (id: string, title: string) => {
+    set(state => ({
+      sessions: state.sessions.map(s => (s.id === id ? { ...s, title } : s)),
     }))
   },
 }))
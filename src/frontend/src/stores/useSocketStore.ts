@@ -2,6 +2,7 @@ import { create } from 'zustand'
 import { io, Socket } from 'socket.io-client'
 import type { LogEntry } from '../types'
 import { useChatStore, genMsgId } from './useChatStore'
+import { toast } from './useToastStore'
 
 // 事件类型定义
 type TtsDoneHandler = (data: { path: string }) => void
@@ -9,7 +10,7 @@ type AsrResultHandler = (data: { text: string }) => void
 type UserMessageHandler = (data: { text: string }) => void
 type AiMessageHandler = (data: { text: string }) => void
 type ExpressionHandler = (data: { emotion: string }) => void
-type ProactiveMessageHandler = (data: { text: string }) => void
+type ProactiveMessageHandler = (data: { text: string; audio?: string }) => void
 
 interface SocketState {
   // 连接实例
@@ -38,6 +39,8 @@ interface SocketState {
   offProactiveMessage: (handler: ProactiveMessageHandler) => void
   // 清除日志
   clearLogs: () => void
+  // 设置服务端推送的最低日志级别
+  setLogLevel: (level: string) => void
 }
 
 export const useSocketStore = create<SocketState>((set, get) => ({
@@ -59,14 +62,25 @@ export const useSocketStore = create<SocketState>((set, get) => ({
     })
     eventsSocket.on('connect', () => set({ eventsConnected: true }))
     eventsSocket.on('disconnect', () => set({ eventsConnected: false }))
-    // 主动消息：全局监听，转发到 chatStore
-    eventsSocket.on('proactive_message', (data: { text: string }) => {
-      useChatStore.getState().handleProactiveMessage(data.text)
+    // 主动消息：全局监听，转发到 chatStore；预合成的语音直接播放
+    eventsSocket.on('proactive_message', (data: { text: string; audio?: string }) => {
+      useChatStore.getState().handleProactiveMessage(data.text, data.audio || undefined)
+      if (data.audio) new Audio(data.audio).play().catch(() => {})
     })
     // TTS 完成：将音频路径持久化到最后一条 assistant 消息
     eventsSocket.on('tts_done', (data: { path: string }) => {
       useChatStore.getState().updateLastAssistantTtsPath(data.path)
     })
+    // 后台生成的会话标题
+    eventsSocket.on('session_title', (data: { id: string; title: string }) => {
+      useChatStore.getState().updateSessionTitle(data.id, data.title)
+    })
+    // 引擎重载进度（后台进行，旧引擎在切换前继续服务）
+    eventsSocket.on('engine_reload', (data: { stage: string; error?: string }) => {
+      if (data.stage === 'loading') toast.info('正在后台加载新引擎…')
+      else if (data.stage === 'done') toast.success('引擎已切换')
+      else if (data.stage === 'error') toast.error(`引擎重载失败：${data.error || '未知错误'}`, 6000)
+    })
     // 服务加载完成通知
     eventsSocket.on('services_ready', (data: Record<string, string>) => {
       const parts: string[] = []
@@ -87,9 +101,10 @@ export const useSocketStore = create<SocketState>((set, get) => ({
     })
     logsSocket.on('connect', () => set({ logsConnected: true }))
     logsSocket.on('disconnect', () => set({ logsConnected: false }))
-    // 日志事件处理
-    logsSocket.on('log', (entry: LogEntry) => {
-      set(state => ({ logs: [...state.logs.slice(-4999), entry] }))
+    // 日志按批推送（含连接时的缓冲回放）
+    logsSocket.on('log_batch', (entries: LogEntry[]) => {
+      if (!entries.length) return
+      set(state => ({ logs: [...state.logs, ...entries].slice(-5000) }))
     })
 
     set({ eventsSocket, logsSocket })
@@ -156,4 +171,8 @@ export const useSocketStore = create<SocketState>((set, get) => ({
   },
 
   clearLogs: () => set({ logs: [] }),
+
+  setLogLevel: (level) => {
+    get().logsSocket?.emit('log_level', { level })
+  },
 }))
@@ -12,9 +12,10 @@ export interface Session {
 }
 
 export interface StreamChunk {
-  type: 'chunk' | 'end' | 'error'
-  text: string
+  type: 'start' | 'chunk' | 'end' | 'error' | 'cancelled'
+  text?: string
   emotion?: string
+  request_id?: string
 }
 
 export interface LogEntry {
@@ -22,6 +23,8 @@ export interface LogEntry {
   level: string
   module: string
   message: string
+  // 限流丢弃标记：本批之前被丢弃的条数
+  dropped?: number
 }
 
 export interface SystemStatus {
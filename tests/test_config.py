@@ -0,0 +1,28 @@
+import pytest
+import yaml
+
+from src.backend.core import config
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.dump({"brain": {"temperature": "hot"}, "general": {"language": "zh"}}), "utf-8")
+    monkeypatch.setattr(config, "_snapshot", None)
+    monkeypatch.setattr(config, "_config_path", config._config_path)
+    config.load_config(path)
+    return path
+
+
+def test_strict_write_rejects_existing_type_errors(config_file):
+    with pytest.raises(config.ConfigError):
+        config.write_config(yaml.safe_load(config_file.read_text("utf-8")))
+
+
+def test_lenient_write_keeps_unrelated_type_errors(config_file):
+    raw = yaml.safe_load(config_file.read_text("utf-8"))
+    raw["general"]["language"] = "en"
+    new = config.write_config(raw, strict=False)
+    assert new["general"]["language"] == "en"
+    assert config.get_config() is new
+    assert yaml.safe_load(config_file.read_text("utf-8"))["brain"]["temperature"] == "hot"
@@ -0,0 +1,27 @@
+import yaml
+
+from src.backend.core import config_diff
+from tests.conftest import ROOT
+
+# API 引擎的 HTTP 连接池在初始化时按 network.* 创建，同样需要重建引擎
+_ENGINE_PREFIXES = ("brain.", "network.")
+
+
+def _example_keys() -> dict:
+    with open(ROOT / "config" / "config.yaml.example", encoding="utf-8") as f:
+        return config_diff.flatten(yaml.safe_load(f))
+
+
+def test_only_engine_sections_trigger_engine_reload():
+    engine_keys = [k for k in _example_keys() if config_diff.classify_key(k) == config_diff.ENGINE]
+    assert engine_keys
+    assert [k for k in engine_keys if not k.startswith(_ENGINE_PREFIXES)] == []
+
+
+def test_face_settings_are_live():
+    assert config_diff.classify_key("face.width") == config_diff.LIVE
+    assert config_diff.classify_key("face.main_window.height") == config_diff.LIVE
+
+
+def test_unknown_key_defaults_to_restart():
+    assert config_diff.classify_key("no_such_section.value") == config_diff.RESTART
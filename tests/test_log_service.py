@@ -0,0 +1,30 @@
+from src.backend.services.log_service import TtsLogTailer
+
+
+def _drain(chunks: list[bytes]) -> tuple[list[str], bytearray]:
+    tailer = TtsLogTailer("tts.log")
+    emitted = []
+    tailer._emit = lambda raw, truncated=False: emitted.append(raw.decode())
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        tailer._drain(buf)
+    return emitted, buf
+
+
+def test_carriage_return_keeps_last_segment():
+    emitted, buf = _drain([b"loading 10\rloading 50\rloaded\nnext line\n"])
+    assert emitted == ["loaded", "next line"]
+    assert buf == b""
+
+
+def test_crlf_split_across_reads():
+    emitted, buf = _drain([b"first\r", b"\nsecond\r\n"])
+    assert emitted == ["first", "second"]
+
+
+def test_progress_without_newline_does_not_grow_buffer():
+    chunk = b"\r" + b"x" * 100
+    emitted, buf = _drain([chunk] * (TtsLogTailer._MAX_LINE // 50))
+    assert emitted == []
+    assert len(buf) <= len(chunk)
@@ -0,0 +1,43 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.backend.brain import session as session_mod
+
+
+@pytest.fixture
+def session_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_mod, "get", lambda key, default=None: str(tmp_path))
+    monkeypatch.setattr(session_mod, "resolve_path", Path)
+    return tmp_path
+
+
+def _write_legacy(session_dir: Path, sid: str, title: str, first_message: str):
+    data = {"id": sid, "title": title, "created_at": 1.0, "updated_at": 1.0,
+            "messages": [{"role": "user", "content": first_message},
+                         {"role": "assistant", "content": "好的"}]}
+    (session_dir / f"{sid}.json").write_text(json.dumps(data, ensure_ascii=False), "utf-8")
+    return {"id": sid, "title": title, "updated_at": 1.0}
+
+
+def test_legacy_renamed_session_keeps_title(session_dir):
+    message = "帮我写一份关于周末去郊外露营需要准备的物品清单"
+    index = [
+        _write_legacy(session_dir, "aa", "露营清单", message),
+        _write_legacy(session_dir, "bb", message[:20], message),
+    ]
+    (session_dir / "index.json").write_text(json.dumps(index, ensure_ascii=False), "utf-8")
+
+    manager = session_mod.SessionManager()
+
+    assert manager.untitled_sessions() == ["bb"]
+    assert not manager.needs_title("aa")
+    assert not manager.set_generated_title("aa", "露营准备")
+    assert manager.set_generated_title("bb", "露营准备")
+    saved = json.loads((session_dir / "aa.json").read_text("utf-8"))
+    assert saved["title"] == "露营清单"
+    assert saved["title_source"] == "user"
+    # 迁移结果写回索引，下次加载不再重复判断
+    reloaded = session_mod.SessionManager()
+    assert {e["id"]: e["title_source"] for e in reloaded.index} == {"aa": "user", "bb": "llm"}